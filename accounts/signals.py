@@ -0,0 +1,23 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from catalog import images
+from .models import Profile
+
+
+@receiver(pre_save, sender=Profile)
+def remember_previous_image(sender, instance, update_fields=None, **kwargs):
+    instance._previous_image = None
+    if instance.pk is None or (update_fields is not None and 'profile_image' not in update_fields):
+        return
+    instance._previous_image = Profile.objects.filter(pk=instance.pk).values_list('profile_image', flat=True).first()
+
+
+@receiver(post_save, sender=Profile)
+def generate_profile_images(sender, instance, created, **kwargs):
+    if not images.changed(instance.profile_image.name, created, instance._previous_image):
+        return
+    transaction.on_commit(partial(images.schedule, instance.profile_image.name))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ProductStats, CategoryStats, UserStats, FAQ
+from .models import ProductStats, CategoryStats, UserStats, MetricsRollup, FAQ
 
 @admin.register(ProductStats)
 class ProductStatsAdmin(admin.ModelAdmin):
@@ -21,6 +21,12 @@ class UserStatsAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['order_count', 'total_spent', 'last_order_date']
 
+@admin.register(MetricsRollup)
+class MetricsRollupAdmin(admin.ModelAdmin):
+    list_display = ['start', 'period', 'orders', 'confirmed_orders', 'cancelled_orders', 'revenue', 'new_users', 'new_buyers']
+    list_filter = ['period']
+    date_hierarchy = 'start'
+
 @admin.register(FAQ)
 class FAQAdmin(admin.ModelAdmin):
     list_display = ['question', 'category', 'language', 'is_published', 'view_count', 'created_at']
@@ -0,0 +1,228 @@
+import bisect
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Timings collected while a single request is handled.
+    """
+    __slots__ = ('queries', 'db_time', 'template_time', 'template_queries', '_template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # Queries issued while rendering are the usual sign of an N+1 in a template.
+        self.template_queries = 0
+        self._template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            if self._template_depth:
+                self.template_queries += 1
+
+    @contextmanager
+    def rendering(self):
+        # Templates rendered from inside another render are already being timed.
+        self._template_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                self.template_time += time.perf_counter() - started
+
+
+class ViewStats:
+    __slots__ = ('requests', 'errors', 'total_time', 'max_time', 'db_time', 'template_time',
+                 'queries', 'max_queries', 'template_queries', 'buckets')
+
+    def __init__(self):
+        self.requests = self.errors = self.queries = self.max_queries = self.template_queries = 0
+        self.total_time = self.max_time = self.db_time = self.template_time = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed, metrics, status_code):
+        self.requests += 1
+        self.errors += status_code >= 500
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.db_time += metrics.db_time
+        self.template_time += metrics.template_time
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.template_queries += metrics.template_queries
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed * 1000)] += 1
+
+    def percentile(self, percent):
+        """
+        Estimate a latency percentile in milliseconds as the upper bound of
+        the bucket it falls in.
+        """
+        wanted = self.requests * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return bound
+        return self.max_time * 1000
+
+    def as_dict(self, view_name):
+        requests = self.requests or 1
+        return {
+            'view': view_name,
+            'requests': self.requests,
+            'errors': self.errors,
+            'total_ms': round(self.total_time * 1000, 1),
+            'mean_ms': round(self.total_time / requests * 1000, 2),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'max_ms': round(self.max_time * 1000, 2),
+            'db_ms': round(self.db_time / requests * 1000, 2),
+            'template_ms': round(self.template_time / requests * 1000, 2),
+            'queries': round(self.queries / requests, 1),
+            'max_queries': self.max_queries,
+            'template_queries': round(self.template_queries / requests, 1),
+            'histogram': dict(zip([f'<={bound}ms' for bound in BUCKETS_MS] + ['slower'], self.buckets)),
+        }
+
+
+class StatsRegistry:
+    """
+    Per-view aggregates for this process. Each worker process keeps its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.since = time.time()
+
+    def record(self, view_name, elapsed, metrics, status_code):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats()
+            stats.add(elapsed, metrics, status_code)
+
+    def snapshot(self):
+        with self._lock:
+            return [stats.as_dict(name) for name, stats in self._views.items()]
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.since = time.time()
+
+
+registry = StatsRegistry()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        with metrics.rendering():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The standard Django template backend, with render time attributed to
+    the current request.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class RequestTimingMiddleware:
+    """
+    Record query count, database time, template time and total view time for
+    every request, add them as a Server-Timing header and fold them into the
+    per-view stats shown in the admin panel.
+
+    Install it first in MIDDLEWARE so the view time covers the whole stack.
+    Who sees the header is controlled by the SERVER_TIMING setting: 'all',
+    'staff' (default) or 'off'.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self.recording(metrics):
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        # A streamed body is produced after this returns; the stats are
+        # recorded once it has been read, but the header can only cover the
+        # time until streaming began.
+        streamed = response.streaming and not response.is_async
+        if streamed:
+            response.streaming_content = self.timed_stream(
+                response.streaming_content, metrics, started, view_name, response.status_code
+            )
+        else:
+            registry.record(view_name, elapsed, metrics, response.status_code)
+
+        if self.show_header(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.1f};desc="{metrics.template_queries} queries"',
+                f'view;dur={elapsed * 1000:.1f}' + (';desc="until streaming began"' if streamed else ''),
+            ])
+        return response
+
+    @staticmethod
+    @contextmanager
+    def recording(metrics):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.record_query))
+            yield
+
+    def timed_stream(self, content, metrics, started, view_name, status_code):
+        try:
+            with self.recording(metrics):
+                yield from content
+        finally:
+            registry.record(view_name, time.perf_counter() - started, metrics, status_code)
+
+    def show_header(self, request):
+        mode = getattr(settings, 'SERVER_TIMING', 'staff')
+        if mode == 'all':
+            return True
+        if mode == 'staff':
+            user = getattr(request, 'user', None)
+            return user is not None and user.is_staff
+        return False
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from admin import metrics
+
+class Command(BaseCommand):
+    help = 'Rebuild the dashboard metrics rollup from orders and users, folding finished days into daily rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Only rebuild today and this many days before it (default: all time)')
+
+    def handle(self, *args, **options):
+        rows = metrics.rebuild(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} metrics rows'))
@@ -0,0 +1,191 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from orders.models import Order
+from .counters import increment
+from .models import MetricsRollup
+
+METRICS = ['orders', 'confirmed_orders', 'cancelled_orders', 'revenue', 'new_users', 'new_buyers']
+
+CONFIRMED_STATUSES = ['confirmed', 'processing', 'shipped', 'delivered']
+
+
+def stage(status):
+    """
+    The rollup column an order in ``status`` counts towards, if any.
+    """
+    if status == 'cancelled':
+        return 'cancelled_orders'
+    if status in CONFIRMED_STATUSES:
+        return 'confirmed_orders'
+    return None
+
+
+def hour_of(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time()))
+
+
+def today_start():
+    return day_start(timezone.localdate())
+
+
+def add(moment, **deltas):
+    """
+    Add ``deltas`` to the hour row that ``moment`` falls in.
+    """
+    add_hours({moment: deltas})
+
+
+def add_hours(hours):
+    """
+    Add ``{field: delta}`` mappings to the hour rows their moments fall in,
+    creating rows the first time an hour is seen.
+    """
+    changes = defaultdict(lambda: defaultdict(int))
+    for moment, deltas in hours.items():
+        for name, value in deltas.items():
+            if value:
+                changes['hour', hour_of(moment)][name] += value
+    if changes:
+        increment(MetricsRollup, ['period', 'start'], changes)
+
+
+def order_placed(order, first_order):
+    deltas = {'orders': 1, 'new_buyers': int(first_order)}
+    if stage(order.status) is not None:
+        deltas[stage(order.status)] = 1
+    if stage(order.status) == 'confirmed_orders':
+        deltas['revenue'] = order.total_price
+    transaction.on_commit(lambda: add(order.created_at, **deltas))
+
+
+def user_joined(user):
+    transaction.on_commit(lambda: add(user.date_joined, new_users=1))
+
+
+def user_deleted(user):
+    transaction.on_commit(lambda: add(user.date_joined, new_users=-1))
+
+
+def order_deleted(order, first_order, next_first_order=None):
+    """
+    Take a deleted order off the hour it was placed in. If it was the
+    customer's first order, their next one (placed at ``next_first_order``)
+    now counts them as a new buyer instead, if there is one.
+    """
+    deltas = {'orders': -1, 'new_buyers': -int(first_order)}
+    if stage(order.status) is not None:
+        deltas[stage(order.status)] = -1
+    if stage(order.status) == 'confirmed_orders':
+        deltas['revenue'] = -order.total_price
+    hours = defaultdict(lambda: defaultdict(int))
+    hours[order.created_at].update(deltas)
+    if first_order and next_first_order is not None:
+        hours[next_first_order]['new_buyers'] += 1
+    transaction.on_commit(lambda: add_hours(hours))
+
+
+def orders_moved(moved, status):
+    """
+    Shift orders that changed status between the rollup columns of the hour
+    each was placed in.
+    """
+    after = stage(status)
+    changed = [order_id for order_id, before in moved.items() if stage(before) != after]
+    if not changed:
+        return
+
+    hours = defaultdict(lambda: defaultdict(int))
+    for order_id, created_at, total_price in Order.objects.filter(pk__in=changed).values_list('pk', 'created_at', 'total_price'):
+        deltas = hours[hour_of(created_at)]
+        before = stage(moved[order_id])
+        if before is not None:
+            deltas[before] -= 1
+        if after is not None:
+            deltas[after] += 1
+        if before == 'confirmed_orders':
+            deltas['revenue'] -= total_price
+        if after == 'confirmed_orders':
+            deltas['revenue'] += total_price
+
+    transaction.on_commit(lambda: add_hours(hours))
+
+
+def totals():
+    """
+    All-time and today's figures, summed from the rollup in one query.
+    """
+    today = today_start()
+    # Aliases can't reuse the field names being summed.
+    sums = {f'{name}_all': Sum(name) for name in METRICS}
+    sums.update({f'{name}_today': Sum(name, filter=Q(start__gte=today)) for name in METRICS})
+    result = MetricsRollup.objects.aggregate(**sums)
+    return {name.removesuffix('_all'): value or 0 for name, value in result.items()}
+
+
+def rebuild(days=None):
+    """
+    Recompute the rollup for today and the ``days`` before it (all time if
+    None) from orders and users, with grouped queries. Days before today
+    get one row each, folding in any hour rows; today keeps hour rows.
+    Returns the number of rows written.
+
+    Changes made while this runs may be lost or counted twice; the next
+    rebuild of the same span puts them right.
+    """
+    today = today_start()
+    since = None if days is None else day_start(timezone.localdate() - timedelta(days=days))
+    orders, users = Order.objects.all(), User.objects.all()
+    if since is not None:
+        orders, users = orders.filter(created_at__gte=since), users.filter(date_joined__gte=since)
+    rows = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+
+    for period, truncate, span in (('day', TruncDay, Q(created_at__lt=today)), ('hour', TruncHour, Q(created_at__gte=today))):
+        grouped = (
+            orders.filter(span).annotate(start=truncate('created_at')).values('start').order_by()
+            .annotate(
+                orders=Count('id'),
+                confirmed_orders=Count('id', filter=Q(status__in=CONFIRMED_STATUSES)),
+                cancelled_orders=Count('id', filter=Q(status='cancelled')),
+                revenue=Sum('total_price', filter=Q(status__in=CONFIRMED_STATUSES)),
+            )
+        )
+        for group in grouped:
+            row = rows[period, group.pop('start')]
+            row.update(group, revenue=group['revenue'] or Decimal('0'))
+
+        joined = users.filter(Q(date_joined__lt=today) if period == 'day' else Q(date_joined__gte=today))
+        for group in joined.annotate(start=truncate('date_joined')).values('start').order_by().annotate(count=Count('id')):
+            rows[period, group['start']]['new_users'] = group['count']
+
+    # A buyer counts once, in the span of their first order ever.
+    first_orders = User.objects.annotate(first_order=Min('order__created_at')).filter(first_order__isnull=False)
+    if since is not None:
+        first_orders = first_orders.filter(first_order__gte=since)
+    for first_order in first_orders.values_list('first_order', flat=True).iterator():
+        if first_order < today:
+            key = 'day', day_start(timezone.localdate(first_order))
+        else:
+            key = 'hour', hour_of(first_order)
+        rows[key]['new_buyers'] += 1
+
+    with transaction.atomic():
+        stale = MetricsRollup.objects.all()
+        if since is not None:
+            stale = stale.filter(start__gte=since)
+        stale.delete()
+        MetricsRollup.objects.bulk_create(
+            [MetricsRollup(period=period, start=start, **values) for (period, start), values in rows.items()],
+            batch_size=1000,
+        )
+    return len(rows)
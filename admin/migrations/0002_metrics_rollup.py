@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+def fill_rollup(apps, schema_editor):
+    # rebuild() only reads order and user columns that have existed since
+    # their first migrations, so the current models are safe to use here.
+    from admin import metrics
+
+    metrics.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin', '0001_initial'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('orders', models.IntegerField(default=0)),
+                ('confirmed_orders', models.IntegerField(default=0)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_users', models.IntegerField(default=0)),
+                ('new_buyers', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['start'],
+                'unique_together': {('period', 'start')},
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
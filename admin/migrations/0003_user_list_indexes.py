@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+USER_INDEXES = ['user_date_joined_idx', 'user_inactive_idx']
+
+
+def create_user_indexes(apps, schema_editor):
+    # auth's User can't declare the indexes the user list's join date
+    # filters and its active users card need.
+    table = schema_editor.quote_name(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table)
+    qn = schema_editor.quote_name
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS user_date_joined_idx ON {table} ({qn("date_joined")})')
+    # Only the few deactivated users are indexed, so counting them reads just those.
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS user_inactive_idx ON {table} ({qn("id")}) WHERE NOT {qn("is_active")}')
+
+
+def drop_user_indexes(apps, schema_editor):
+    for name in USER_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin', '0002_metrics_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['order_count'], name='userstats_order_count_idx'),
+        ),
+        migrations.RunPython(create_user_indexes, drop_user_indexes),
+    ]
@@ -28,9 +28,41 @@ class UserStats(models.Model):
     total_spent = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     last_order_date = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['order_count'], name='userstats_order_count_idx')]
+    
     def __str__(self):
         return f"Stats for {self.user.username}"
 
+class MetricsRollup(models.Model):
+    """
+    Order and signup counts for the orders placed and users joined in one
+    hour or one day. Rows are additive: the totals for any span are the sum
+    of the rows in it, whatever their period.
+    """
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    orders = models.IntegerField(default=0)
+    # Of those orders, how many are now confirmed or further along, and how
+    # many were cancelled. The rest are pending.
+    confirmed_orders = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_users = models.IntegerField(default=0)
+    new_buyers = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['period', 'start']
+        ordering = ['start']
+    
+    def __str__(self):
+        return f"{self.get_period_display()} from {self.start:%Y-%m-%d %H:%M}"
+
 class FAQ(models.Model):
     LANGUAGE_CHOICES = [
         ('en', 'English'),
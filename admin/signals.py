@@ -0,0 +1,83 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from catalog.models import Product
+from orders.models import Order
+from orders.signals import status_changed
+from wishlist.models import Wishlist
+
+from . import metrics, stats
+
+
+@receiver(post_save, sender=Order)
+def count_new_order(sender, instance, created, **kwargs):
+    if created:
+        first_order = not Order.objects.filter(user_id=instance.user_id).exclude(pk=instance.pk).exists()
+        metrics.order_placed(instance, first_order)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_first_order(sender, instance, **kwargs):
+    # Checked before the delete, while every order of a cascade still exists.
+    earlier = Q(created_at__lt=instance.created_at) | Q(created_at=instance.created_at, pk__lt=instance.pk)
+    instance._first_order = not Order.objects.filter(earlier, user_id=instance.user_id).exists()
+
+
+@receiver(pre_delete, sender=Order)
+def update_stats_on_delete(sender, instance, **kwargs):
+    stats.orders_deleted({instance.pk: instance.status})
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, **kwargs):
+    first_order = getattr(instance, '_first_order', False)
+    next_first_order = None
+    if first_order:
+        next_first_order = (
+            Order.objects.filter(user_id=instance.user_id).order_by('created_at', 'pk')
+            .values_list('created_at', flat=True).first()
+        )
+    metrics.order_deleted(instance, first_order, next_first_order)
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        metrics.user_joined(instance)
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    metrics.user_deleted(instance)
+
+
+@receiver(status_changed)
+def count_status_change(sender, moved, status, **kwargs):
+    metrics.orders_moved(moved, status)
+
+
+@receiver(status_changed)
+def update_stats_on_status_change(sender, moved, status, **kwargs):
+    stats.orders_moved(moved, status)
+
+
+@receiver(post_save, sender=Wishlist)
+def count_wishlist_add(sender, instance, created, **kwargs):
+    if created:
+        stats.wishlist_changed(instance.product_id, 1)
+
+
+@receiver(post_delete, sender=Wishlist)
+def count_wishlist_remove(sender, instance, **kwargs):
+    stats.wishlist_changed(instance.product_id, -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_category_stats(sender, instance, **kwargs):
+    # catalog.signals remembers the category a saved product was moved from.
+    previous = getattr(instance, '_previous', None) or {}
+    category_ids = {instance.category_id, previous.get('category_id', instance.category_id)}
+    transaction.on_commit(lambda: stats.refresh_categories(category_ids))
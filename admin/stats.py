@@ -0,0 +1,162 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, DateTimeField, DecimalField, F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.contrib.auth.models import User
+from catalog.models import Category, Product
+from orders.models import Order, OrderItem
+from wishlist.models import Wishlist
+from .counters import increment
+from .metrics import CONFIRMED_STATUSES
+from .models import ProductStats, CategoryStats, UserStats
+
+
+def orders_moved(moved, status):
+    """
+    Count orders towards their products, categories and customers when they
+    are confirmed, and take them off again when a confirmed order is
+    cancelled. The items are read now; the counters move after commit.
+    """
+    confirmed = status in CONFIRMED_STATUSES
+    changed = [order_id for order_id, before in moved.items() if (before in CONFIRMED_STATUSES) != confirmed]
+    if not changed:
+        return
+    sign = 1 if confirmed else -1
+
+    products = defaultdict(lambda: defaultdict(int))
+    categories = defaultdict(lambda: defaultdict(int))
+    users = defaultdict(lambda: defaultdict(int))
+    placed = {}
+    for order_id, user_id, total_price, created_at in Order.objects.filter(pk__in=changed).values_list(
+        'pk', 'user_id', 'total_price', 'created_at'
+    ):
+        placed[order_id] = created_at
+        users[user_id]['order_count'] += sign
+        users[user_id]['total_spent'] += sign * total_price
+        if confirmed:
+            users[user_id]['last_order_date'] = max(created_at, users[user_id].get('last_order_date', created_at))
+    items = OrderItem.objects.filter(order_id__in=changed).values_list(
+        'order_id', 'product_id', 'product__category_id', 'price', 'quantity'
+    )
+    for order_id, product_id, category_id, price, quantity in items:
+        products[product_id]['times_ordered'] += sign
+        products[product_id]['total_revenue'] += sign * price * quantity
+        categories[category_id]['total_revenue'] += sign * price * quantity
+        if confirmed:
+            created_at = placed[order_id]
+            products[product_id]['last_ordered'] = max(created_at, products[product_id].get('last_ordered', created_at))
+
+    @transaction.atomic
+    def apply():
+        # Taking counts off never needs a new row; the customer or product
+        # may be being deleted along with the order.
+        increment(ProductStats, ['product_id'], {(pk,): deltas for pk, deltas in products.items()}, clamp=True, create=confirmed)
+        increment(CategoryStats, ['category_id'], {(pk,): deltas for pk, deltas in categories.items()}, clamp=True, create=confirmed)
+        increment(UserStats, ['user_id'], {(pk,): deltas for pk, deltas in users.items()}, clamp=True, create=confirmed)
+        if not confirmed:
+            # The cancelled order may have been the latest one.
+            _refresh_latest(products, users)
+    transaction.on_commit(apply)
+
+
+def orders_deleted(statuses):
+    """
+    Take orders about to be deleted, given as ``{order id: status}``, off
+    the stats they count towards. Must run before the items are deleted.
+    """
+    orders_moved(statuses, None)
+
+
+def _refresh_latest(product_ids, user_ids):
+    items = OrderItem.objects.filter(product_id=OuterRef('product_id'), order__status__in=CONFIRMED_STATUSES)
+    ProductStats.objects.filter(product_id__in=product_ids).update(
+        last_ordered=_subquery(items, 'product_id', Max('order__created_at'), DateTimeField()),
+    )
+    orders = Order.objects.filter(user_id=OuterRef('user_id'), status__in=CONFIRMED_STATUSES)
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        last_order_date=_subquery(orders, 'user_id', Max('created_at'), DateTimeField()),
+    )
+
+
+def wishlist_changed(product_id, delta):
+    transaction.on_commit(
+        lambda: increment(ProductStats, ['product_id'], {(product_id,): {'wishlist_count': delta}}, clamp=True)
+    )
+
+
+def _subquery(queryset, group_by, value, output_field):
+    # One aggregate per outer row, read through the group_by index.
+    return Subquery(queryset.values(group_by).order_by().annotate(value=value).values('value'), output_field=output_field)
+
+
+def _money(queryset, group_by, value):
+    return Coalesce(_subquery(queryset, group_by, value, DecimalField()), Value(Decimal('0')), output_field=DecimalField())
+
+
+def _count(queryset, group_by, value):
+    return Coalesce(_subquery(queryset, group_by, value, IntegerField()), Value(0))
+
+
+def rebuild_products(first_id, last_id):
+    """
+    Recompute ProductStats for products with ids in ``[first_id, last_id]``
+    with one correlated UPDATE.
+    """
+    ids = Product.objects.filter(pk__gte=first_id, pk__lte=last_id).values_list('pk', flat=True)
+    ProductStats.objects.bulk_create([ProductStats(product_id=pk) for pk in ids], ignore_conflicts=True)
+    items = OrderItem.objects.filter(product_id=OuterRef('product_id'), order__status__in=CONFIRMED_STATUSES)
+    wishlists = Wishlist.objects.filter(product_id=OuterRef('product_id'))
+    return ProductStats.objects.filter(product_id__gte=first_id, product_id__lte=last_id).update(
+        times_ordered=_count(items, 'product_id', Count('id')),
+        total_revenue=_money(items, 'product_id', Sum(F('price') * F('quantity'))),
+        last_ordered=_subquery(items, 'product_id', Max('order__created_at'), DateTimeField()),
+        wishlist_count=_count(wishlists, 'product_id', Count('id')),
+    )
+
+
+def rebuild_users(first_id, last_id):
+    """
+    Recompute UserStats for users with ids in ``[first_id, last_id]`` with
+    one correlated UPDATE.
+    """
+    ids = User.objects.filter(pk__gte=first_id, pk__lte=last_id).values_list('pk', flat=True)
+    UserStats.objects.bulk_create([UserStats(user_id=pk) for pk in ids], ignore_conflicts=True)
+    orders = Order.objects.filter(user_id=OuterRef('user_id'), status__in=CONFIRMED_STATUSES)
+    return UserStats.objects.filter(user_id__gte=first_id, user_id__lte=last_id).update(
+        order_count=_count(orders, 'user_id', Count('id')),
+        total_spent=_money(orders, 'user_id', Sum('total_price')),
+        last_order_date=_subquery(orders, 'user_id', Max('created_at'), DateTimeField()),
+    )
+
+
+def refresh_categories(category_ids):
+    """
+    Recount the products and average price of the given categories.
+    """
+    # A product deleted along with its category leaves nothing to count.
+    existing = list(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+    return _rebuild_categories(existing, revenue=False)
+
+
+def rebuild_categories():
+    """
+    Recompute every CategoryStats row, revenue included.
+    """
+    return _rebuild_categories(list(Category.objects.values_list('pk', flat=True)), revenue=True)
+
+
+def _rebuild_categories(category_ids, revenue):
+    CategoryStats.objects.bulk_create([CategoryStats(category_id=pk) for pk in category_ids], ignore_conflicts=True)
+    products = Product.objects.filter(category_id=OuterRef('category_id'))
+    values = {
+        'product_count': _count(products, 'category_id', Count('id')),
+        'average_price': _money(products, 'category_id', Avg('price')),
+    }
+    if revenue:
+        items = OrderItem.objects.filter(
+            product__category_id=OuterRef('category_id'), order__status__in=CONFIRMED_STATUSES
+        )
+        values['total_revenue'] = _money(items, 'product__category_id', Sum(F('price') * F('quantity')))
+    return CategoryStats.objects.filter(category_id__in=category_ids).update(**values)
@@ -24,6 +24,7 @@ urlpatterns = [
     path('orders/', views.order_list, name='order_list'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('orders/export/', views.export_orders, name='export_orders'),
+    path('orders/export/items/', views.export_order_items, name='export_order_items'),
     
     # User URLs
     path('users/', views.user_list, name='user_list'),
@@ -36,8 +37,12 @@ urlpatterns = [
     path('faqs/<int:faq_id>/edit/', views.faq_edit, name='faq_edit'),
     path('faqs/<int:faq_id>/delete/', views.faq_delete, name='faq_delete'),
     
+    # Performance
+    path('performance/', views.request_stats, name='request_stats'),
+    
     # AJAX URLs
     path('orders/<int:order_id>/update-status/', views.update_order_status, name='update_order_status'),
+    path('orders/bulk-update-status/', views.bulk_update_order_status, name='bulk_update_order_status'),
     path('users/<int:user_id>/toggle-status/', views.toggle_user_status, name='toggle_user_status'),
     path('faqs/<int:faq_id>/toggle-status/', views.toggle_faq_status, name='toggle_faq_status'),
 ]
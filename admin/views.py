@@ -1,21 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Count, Sum, Avg, Q, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
 from django.views.decorators.http import require_POST
 from django.template.loader import render_to_string
+from orders import status as order_status
 from orders.models import Order, OrderItem
+from catalog.pagination import KeysetPaginator
 from catalog.models import Product, Category
 from accounts.models import Profile
 from .models import FAQ, ProductStats, CategoryStats, UserStats
 from .forms import ProductForm, CategoryForm, FAQForm
+from .instrumentation import registry
+from . import metrics
 import csv
 import io
+import itertools
+import zlib
 from datetime import datetime, timedelta
+from decimal import Decimal
 
 def is_admin(user):
     return user.is_superuser or user.is_staff
@@ -23,33 +33,25 @@ def is_admin(user):
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    # Get statistics
-    total_users = User.objects.count()
-    total_orders = Order.objects.count()
-    total_products = Product.objects.count()
-    total_categories = Category.objects.count()
+    # Order and user figures come from the rollup, so the page costs the
+    # same however many orders there are.
+    totals = metrics.totals()
     
     # Recent orders
     recent_orders = Order.objects.select_related('user').order_by('-created_at')[:10]
     
-    # Additional stats
-    total_revenue = Order.objects.aggregate(total=Sum('total_price'))['total'] or 0
-    pending_orders = Order.objects.filter(status='pending').count()
-    active_users = User.objects.filter(is_active=True).count()
-    new_users_today = User.objects.filter(date_joined__date=timezone.now().date()).count()
-    users_with_orders = User.objects.annotate(order_count=Count('order')).filter(order_count__gt=0).count()
-    
     context = {
-        'total_users': total_users,
-        'total_orders': total_orders,
-        'total_products': total_products,
-        'total_categories': total_categories,
+        'total_users': totals['new_users'],
+        'total_orders': totals['orders'],
+        'total_products': Product.objects.count(),
+        'total_categories': Category.objects.count(),
         'recent_orders': recent_orders,
-        'total_revenue': total_revenue,
-        'pending_orders': pending_orders,
-        'active_users': active_users,
-        'new_users_today': new_users_today,
-        'users_with_orders': users_with_orders,
+        'total_revenue': totals['revenue'],
+        'pending_orders': totals['orders'] - totals['confirmed_orders'] - totals['cancelled_orders'],
+        'orders_today': totals['orders_today'],
+        'revenue_today': totals['revenue_today'],
+        'new_users_today': totals['new_users_today'],
+        'users_with_orders': totals['new_buyers'],
     }
     return render(request, 'admin/admin_dashboard.html', context)
 
@@ -182,7 +184,7 @@ def category_detail(request, category_id):
     stats, created = CategoryStats.objects.get_or_create(category=category)
     
     # Get products in this category
-    products = category.product.all()
+    products = category.product_set.all()
     
     context = {
         'category': category,
@@ -234,16 +236,15 @@ def category_delete(request, category_id):
     
     return render(request, 'admin/category_confirm_delete.html', {'category': category})
 
-@login_required
-@user_passes_test(is_admin)
-def order_list(request):
-    orders = Order.objects.select_related('user').prefetch_related('items')
-    
-    # Filtering
-    search = request.GET.get('search')
-    status = request.GET.get('status')
-    payment = request.GET.get('payment')
-    date_from = request.GET.get('date_from')
+def filter_orders(orders, params):
+    """
+    Apply the order list's search, status, payment and date filters, so
+    that exports match what is on screen.
+    """
+    search = params.get('search')
+    status = params.get('status')
+    payment = params.get('payment')
+    date_from = params.get('date_from')
     
     if search:
         orders = orders.filter(
@@ -260,22 +261,47 @@ def order_list(request):
         orders = orders.exclude(stripe_payment_id='')
     elif payment == 'pending':
         orders = orders.filter(stripe_payment_id='')
-    
+    elif payment == 'review':
+        orders = orders.filter(paid_after_cancel=True)
+    
+    try:
+        date_from = parse_date(date_from or '')
+    except ValueError:
+        date_from = None
+    # Comparing created_at itself, not its date, lets the index be used.
     if date_from:
-        orders = orders.filter(created_at__date__gte=date_from)
+        orders = orders.filter(created_at__gte=metrics.day_start(date_from))
     
-    # Stats
-    total_orders = orders.count()
-    total_revenue = orders.aggregate(total=Sum('total_price'))['total'] or 0
-    avg_order_value = orders.aggregate(avg=Avg('total_price'))['avg'] or 0
-    pending_orders = orders.filter(status='pending').count()
+    return orders
+
+ORDERS_PER_PAGE = 50
+
+@login_required
+@user_passes_test(is_admin)
+def order_list(request):
+    orders = filter_orders(Order.objects.all(), request.GET)
+    
+    # Stats, in one pass over the filtered orders
+    stats = orders.aggregate(
+        total_orders=Count('id'),
+        total_revenue=Sum('total_price'),
+        avg_order_value=Avg('total_price'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+    )
+    
+    # Unit counts are stored on the order, so rows need no extra queries.
+    paginator = KeysetPaginator(orders, ORDERS_PER_PAGE, ordering=('-created_at', '-id'))
+    page_obj = paginator.get_page(request.GET.get('cursor', ''))
+    filter_query = urlencode({key: value for key, value in request.GET.items() if value and key != 'cursor'})
     
     context = {
-        'orders': orders,
-        'total_orders': total_orders,
-        'total_revenue': total_revenue,
-        'avg_order_value': avg_order_value,
-        'pending_orders': pending_orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
+        'filter_query': filter_query,
+        'total_orders': stats['total_orders'],
+        'total_revenue': stats['total_revenue'] or 0,
+        'avg_order_value': stats['avg_order_value'] or 0,
+        'pending_orders': stats['pending_orders'],
     }
     return render(request, 'admin/order_list.html', context)
 
@@ -285,19 +311,14 @@ def order_detail(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     return render(request, 'admin/order_detail.html', {'order': order})
 
-@login_required
-@user_passes_test(is_admin)
-def user_list(request):
-    users = User.objects.select_related('profile').annotate(
-        order_count=Count('order'),
-        total_spent=Sum('order__total_price')
-    )
-    
-    # Filtering
-    search = request.GET.get('search')
-    status = request.GET.get('status')
-    date_joined = request.GET.get('date_joined')
-    orders = request.GET.get('orders')
+def filter_users(users, params):
+    """
+    Apply the user list's search, status, join date and orders filters.
+    """
+    search = params.get('search')
+    status = params.get('status')
+    date_joined = params.get('date_joined')
+    orders = params.get('orders')
     
     if search:
         users = users.filter(
@@ -317,7 +338,7 @@ def user_list(request):
         users = users.filter(is_superuser=True)
     
     if date_joined == 'today':
-        users = users.filter(date_joined__date=timezone.now().date())
+        users = users.filter(date_joined__gte=metrics.today_start())
     elif date_joined == 'week':
         users = users.filter(date_joined__gte=timezone.now() - timedelta(days=7))
     elif date_joined == 'month':
@@ -325,23 +346,47 @@ def user_list(request):
     elif date_joined == 'year':
         users = users.filter(date_joined__gte=timezone.now() - timedelta(days=365))
     
+    # The same confirmed-order count the list shows, read through its index.
     if orders == 'with_orders':
-        users = users.filter(order_count__gt=0)
+        users = users.filter(userstats__order_count__gt=0)
     elif orders == 'without_orders':
-        users = users.filter(order_count=0)
+        users = users.filter(Q(userstats__isnull=True) | Q(userstats__order_count=0))
     
-    # Stats
-    total_users = users.count()
-    active_users = users.filter(is_active=True).count()
-    new_users_today = users.filter(date_joined__date=timezone.now().date()).count()
-    users_with_orders = users.filter(order_count__gt=0).count()
+    return users
+
+USERS_PER_PAGE = 50
+
+@login_required
+@user_passes_test(is_admin)
+def user_list(request):
+    users = filter_users(User.objects.all(), request.GET)
+    
+    # Site-wide figures from the dashboard rollup; only deactivated users,
+    # a handful, are counted here.
+    totals = metrics.totals()
+    stats = {
+        'total_users': totals['new_users'],
+        'active_users': totals['new_users'] - User.objects.filter(is_active=False).count(),
+        'new_users_today': totals['new_users_today'],
+        'users_with_orders': totals['new_buyers'],
+    }
+    
+    # Confirmed order figures come from the maintained UserStats row, not a
+    # join over every order. Walking the primary key keeps each page an
+    # indexed range.
+    users = users.select_related('profile').annotate(
+        order_count=Coalesce('userstats__order_count', 0),
+        total_spent=Coalesce('userstats__total_spent', Decimal('0'), output_field=DecimalField()),
+    )
+    paginator = KeysetPaginator(users, USERS_PER_PAGE, ordering=('-id',))
+    page_obj = paginator.get_page(request.GET.get('cursor', ''))
+    filter_query = urlencode({key: value for key, value in request.GET.items() if value and key != 'cursor'})
     
     context = {
-        'users': users,
-        'total_users': total_users,
-        'active_users': active_users,
-        'new_users_today': new_users_today,
-        'users_with_orders': users_with_orders,
+        'users': page_obj,
+        'page_obj': page_obj,
+        'filter_query': filter_query,
+        **stats,
     }
     return render(request, 'admin/user_list.html', context)
 
@@ -451,12 +496,40 @@ def update_order_status(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     new_status = request.POST.get('status')
     
-    if new_status in [choice[0] for choice in Order.STATUS_CHOICES]:
-        order.status = new_status
-        order.save()
-        return JsonResponse({'success': True})
+    if new_status not in dict(Order.STATUS_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid status'})
+    if not order.can_move_to(new_status) or not order_status.transition([order.id], new_status, request.user):
+        return JsonResponse({'success': False, 'error': f'Cannot move a {order.status} order to {new_status}'})
     
-    return JsonResponse({'success': False, 'error': 'Invalid status'})
+    return JsonResponse({'success': True})
+
+# Enough for a day's shipping in a few requests while keeping each UPDATE's IN list small.
+MAX_BULK_ORDERS = 1000
+
+@require_POST
+@login_required
+@user_passes_test(is_admin)
+def bulk_update_order_status(request):
+    new_status = request.POST.get('status')
+    try:
+        order_ids = {int(order_id) for order_id in request.POST.getlist('order_ids')}
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid order ids'}, status=400)
+    
+    if new_status not in dict(Order.STATUS_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+    if not order_ids:
+        return JsonResponse({'success': False, 'error': 'No orders selected'}, status=400)
+    if len(order_ids) > MAX_BULK_ORDERS:
+        return JsonResponse({'success': False, 'error': f'At most {MAX_BULK_ORDERS} orders per request'}, status=400)
+    
+    moved = order_status.transition(order_ids, new_status, request.user)
+    
+    return JsonResponse({
+        'success': True,
+        'updated': len(moved),
+        'skipped': sorted(order_ids - moved.keys()),
+    })
 
 @require_POST
 @login_required
@@ -481,49 +554,110 @@ def toggle_faq_status(request, faq_id):
     return JsonResponse({'success': True})
 
 # Export Views
+# Rows fetched per round trip while streaming an export.
+EXPORT_CHUNK_SIZE = 2000
+# CSV lines joined into each chunk sent to the client.
+EXPORT_LINES_PER_WRITE = 500
+
+class Echo:
+    """
+    A write-only file for csv.writer that hands back each line instead of
+    storing it.
+    """
+    def write(self, value):
+        return value
+
+def csv_response(request, filename, header, rows):
+    """
+    Stream ``rows`` as a CSV download, gzipped when the request asks for
+    ``?gzip=1``. Memory use stays flat however many rows there are.
+    """
+    writer = csv.writer(Echo())
+    lines = itertools.chain([writer.writerow(header)], (writer.writerow(row) for row in rows))
+    chunks = (
+        ''.join(batch).encode()
+        for batch in iter(lambda: list(itertools.islice(lines, EXPORT_LINES_PER_WRITE)), [])
+    )
+    
+    if request.GET.get('gzip') == '1':
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 @login_required
 @user_passes_test(is_admin)
 def export_orders(request):
-    orders = Order.objects.all()
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="orders.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Order ID', 'Customer', 'Email', 'Total', 'Status', 'Date'])
-    
-    for order in orders:
-        writer.writerow([
-            order.id,
-            f"{order.first_name} {order.last_name}",
-            order.email,
-            order.total_price,
-            order.status,
-            order.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    
-    return response
+    orders = filter_orders(Order.objects.order_by('id'), request.GET).values_list(
+        'id', 'first_name', 'last_name', 'email', 'total_price', 'status', 'created_at'
+    )
+    rows = (
+        [order_id, f"{first_name} {last_name}", email, total_price, status, created_at.strftime('%Y-%m-%d %H:%M')]
+        for order_id, first_name, last_name, email, total_price, status, created_at
+        in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return csv_response(request, 'orders.csv', ['Order ID', 'Customer', 'Email', 'Total', 'Status', 'Date'], rows)
+
+@login_required
+@user_passes_test(is_admin)
+def export_order_items(request):
+    orders = filter_orders(Order.objects.all(), request.GET)
+    items = OrderItem.objects.filter(order__in=orders.values('pk')).order_by('order_id', 'id').values_list(
+        'order_id', 'order__created_at', 'order__status', 'product_id', 'product__name', 'price', 'quantity'
+    )
+    rows = (
+        [order_id, created_at.strftime('%Y-%m-%d %H:%M'), status, product_id, product_name, price, quantity, price * quantity]
+        for order_id, created_at, status, product_id, product_name, price, quantity
+        in items.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    header = ['Order ID', 'Date', 'Status', 'Product ID', 'Product', 'Price', 'Quantity', 'Total']
+    return csv_response(request, 'order_items.csv', header, rows)
 
 @login_required
 @user_passes_test(is_admin)
 def export_users(request):
-    users = User.objects.all()
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="users.csv"'
+    users = filter_users(User.objects.order_by('id'), request.GET).values_list(
+        'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'date_joined'
+    )
+    rows = (
+        [username, email, first_name, last_name, is_active, is_staff, date_joined.strftime('%Y-%m-%d %H:%M')]
+        for username, email, first_name, last_name, is_active, is_staff, date_joined
+        in users.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    header = ['Username', 'Email', 'First Name', 'Last Name', 'Active', 'Staff', 'Date Joined']
+    return csv_response(request, 'users.csv', header, rows)
+
+REQUEST_STATS_SORTS = ['total_ms', 'mean_ms', 'p95_ms', 'queries', 'template_queries', 'db_ms', 'requests']
+
+@login_required
+@user_passes_test(is_admin)
+def request_stats(request):
+    if request.method == 'POST':
+        registry.reset()
+        messages.success(request, 'Request statistics reset.')
+        return redirect('admin:request_stats')
     
-    writer = csv.writer(response)
-    writer.writerow(['Username', 'Email', 'First Name', 'Last Name', 'Active', 'Staff', 'Date Joined'])
+    sort = request.GET.get('sort')
+    if sort not in REQUEST_STATS_SORTS:
+        sort = 'total_ms'
+    views = sorted(registry.snapshot(), key=lambda row: row[sort], reverse=True)
     
-    for user in users:
-        writer.writerow([
-            user.username,
-            user.email,
-            user.first_name,
-            user.last_name,
-            user.is_active,
-            user.is_staff,
-            user.date_joined.strftime('%Y-%m-%d %H:%M')
-        ])
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'since': registry.since, 'views': views})
     
-    return response
+    context = {
+        'views': views,
+        'sort': sort,
+        'since': datetime.fromtimestamp(registry.since, tz=timezone.get_current_timezone()),
+    }
+    return render(request, 'admin/request_stats.html', context)
@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .cart import Cart
+from .models import StoredCart, CartLine
 
-# Cart doesn't have persistent models, but we can add admin for any cart-related models if needed
-# For now, cart functionality is handled through the session-based Cart class
+class CartLineInline(admin.TabularInline):
+    model = CartLine
+    raw_id_fields = ['product']
+    extra = 0
+
+@admin.register(StoredCart)
+class StoredCartAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'item_count', 'subtotal', 'updated_at']
+    list_filter = ['updated_at']
+    raw_id_fields = ['user']
+    inlines = [CartLineInline]
@@ -1,54 +1,268 @@
 from decimal import Decimal
 
+from django.db import transaction
+from django.db.models import F
+from .models import StoredCart, CartLine
+
+# The session only points at the stored cart and caches its total quantity,
+# so the navbar badge needs no query.
+CART_SESSION_KEY = 'cart_id'
+COUNT_SESSION_KEY = 'cart_count'
+# Sessions from before carts were stored kept every line under this key.
+LEGACY_SESSION_KEY = 'cart'
+
+_unresolved = object()
+
+class CartItem:
+    """
+    One line of a cart snapshot.
+    """
+    __slots__ = ('product', 'quantity', 'price', 'total_price')
+
+    def __init__(self, product, quantity, price):
+        self.product = product
+        self.quantity = quantity
+        self.price = price
+        self.total_price = price * quantity
+
+class CartSnapshot:
+    """
+    The cart's lines as read once, with the subtotal and count worked out
+    once. Iterating it again costs nothing.
+    """
+    __slots__ = ('items', 'subtotal', 'count')
+
+    def __init__(self, items):
+        self.items = tuple(items)
+        self.subtotal = sum((item.total_price for item in self.items), Decimal('0.00'))
+        self.count = sum(item.quantity for item in self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return self.count
+
+def get_cart(request):
+    """
+    Return the Cart for this request, shared by the view, the context
+    processor and anything else that asks, so its lines are read only once.
+    """
+    cart = getattr(request, '_cart', None)
+    if cart is None:
+        cart = request._cart = Cart(request)
+    return cart
+
 class Cart:
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get('cart')
-        if not cart:
-            cart = self.session['cart'] = {}
-        self.cart = cart
+        user = getattr(request, 'user', None)
+        self.user = user if user is not None and user.is_authenticated else None
+        self._stored = _unresolved
+        self._snapshot = None
+
+    @property
+    def stored(self):
+        """
+        The StoredCart behind this cart, or None. Reading never creates one.
+        A user's cart is the one on their account; a visitor's is found
+        through the session.
+        """
+        if self._stored is _unresolved:
+            if self.user is not None:
+                self._stored = StoredCart.objects.filter(user=self.user).first()
+            else:
+                self._stored = self._session_cart()
+        return self._stored
+
+    def _session_cart(self):
+        cart_id = self.session.get(CART_SESSION_KEY)
+        if cart_id is not None:
+            return StoredCart.objects.filter(pk=cart_id).first()
+        if self.session.get(LEGACY_SESSION_KEY):
+            return self._import_legacy()
+        return None
+
+    def _import_legacy(self):
+        from catalog.models import Product
+
+        legacy = self.session.pop(LEGACY_SESSION_KEY)
+        products = Product.objects.in_bulk([int(product_id) for product_id in legacy])
+        with transaction.atomic():
+            stored = StoredCart.objects.create()
+            CartLine.objects.bulk_create([
+                CartLine(cart=stored, product=products[int(product_id)],
+                         quantity=item['quantity'], price=Decimal(item['price']))
+                for product_id, item in legacy.items()
+                if int(product_id) in products and item['quantity'] > 0
+            ])
+            stored.refresh_totals()
+        self._point_at(stored)
+        return stored
+
+    def _get_or_create_stored(self):
+        if self.stored is None:
+            if self.user is not None:
+                self._stored, created = StoredCart.objects.get_or_create(user=self.user)
+            else:
+                self._stored = StoredCart.objects.create()
+            self._point_at(self._stored)
+        return self._stored
+
+    def _point_at(self, stored):
+        self.session[CART_SESSION_KEY] = stored.pk
+        self.session[COUNT_SESSION_KEY] = stored.item_count
 
     def add(self, product, quantity=1, override_quantity=False):
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {'quantity': 0, 'price': str(product.price)}
-        
-        if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        
+        if override_quantity and quantity <= 0:
+            self.remove(product)
+            return
+
+        stored = self._get_or_create_stored()
+        line, created = CartLine.objects.get_or_create(
+            cart=stored, product=product, defaults={'quantity': quantity, 'price': product.price}
+        )
+        if not created:
+            if override_quantity:
+                CartLine.objects.filter(pk=line.pk).update(quantity=quantity)
+            else:
+                CartLine.objects.filter(pk=line.pk).update(quantity=F('quantity') + quantity)
+
         self.save()
 
+    def apply(self, operations):
+        """
+        Apply a list of ``(op, product, quantity)`` changes, where op is
+        'add', 'set' or 'remove', in order and in one transaction: the
+        existing lines are read once and written back with one statement per
+        kind of change. The products must already be loaded.
+        """
+        with transaction.atomic():
+            stored = self._get_or_create_stored()
+            lines = {line.product_id: line for line in stored.lines.select_related('product__category').order_by('id')}
+            original = {product_id: line.quantity for product_id, line in lines.items()}
+
+            for op, product, quantity in operations:
+                line = lines.get(product.id)
+                if op == 'remove' or (op == 'set' and quantity <= 0):
+                    lines.pop(product.id, None)
+                elif line is None:
+                    lines[product.id] = CartLine(cart=stored, product=product, quantity=quantity, price=product.price)
+                elif op == 'set':
+                    line.quantity = quantity
+                else:
+                    line.quantity += quantity
+
+            removed = [product_id for product_id in original if product_id not in lines]
+            created = [line for line in lines.values() if line.pk is None]
+            changed = [line for line in lines.values() if line.pk is not None and line.quantity != original[line.product_id]]
+            if removed:
+                CartLine.objects.filter(cart=stored, product_id__in=removed).delete()
+            if created:
+                CartLine.objects.bulk_create(created)
+            if changed:
+                CartLine.objects.bulk_update(changed, ['quantity'])
+
+            # Every line is already in hand, so the totals need no re-read.
+            self._snapshot = CartSnapshot(CartItem(line.product, line.quantity, line.price) for line in lines.values())
+            stored.item_count = self._snapshot.count
+            stored.subtotal = self._snapshot.subtotal
+            stored.save(update_fields=['item_count', 'subtotal', 'updated_at'])
+        self.session[COUNT_SESSION_KEY] = stored.item_count
+
     def remove(self, product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        if self.stored is not None:
+            CartLine.objects.filter(cart=self.stored, product=product).delete()
             self.save()
 
     def save(self):
-        self.session.modified = True
+        self._snapshot = None
+        self.stored.refresh_totals()
+        self.session[COUNT_SESSION_KEY] = self.stored.item_count
+
+    def snapshot(self):
+        """
+        Read the lines with their products and categories in one query, once
+        per Cart.
+        """
+        if self._snapshot is None:
+            lines = CartLine.objects.select_related('product__category').order_by('id')
+            # Filter on the owner or the session pointer so the cart row needn't be loaded.
+            if self._stored is not _unresolved:
+                lines = lines.filter(cart=self._stored) if self._stored is not None else lines.none()
+            elif self.user is not None:
+                lines = lines.filter(cart__user=self.user)
+            elif self.session.get(CART_SESSION_KEY) is not None:
+                lines = lines.filter(cart_id=self.session[CART_SESSION_KEY])
+            elif self.stored is not None:
+                lines = lines.filter(cart=self.stored)
+            else:
+                lines = lines.none()
+            self._snapshot = CartSnapshot(
+                CartItem(line.product, line.quantity, line.price) for line in lines
+            )
+        return self._snapshot
 
     def __iter__(self):
-        product_ids = self.cart.keys()
-        from catalog.models import Product
-        products = Product.objects.filter(id__in=product_ids)
-        
-        cart = self.cart.copy()
-        for product in products:
-            cart[str(product.id)]['product'] = product
-        
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        return iter(self.snapshot())
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
+        count = self.session.get(COUNT_SESSION_KEY)
+        if count is None:
+            # Nothing cached yet; only costs a query for a user or a legacy session.
+            count = self.stored.item_count if self.stored is not None else 0
+        return count
 
     def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        return self.snapshot().subtotal
 
     def clear(self):
-        del self.session['cart']
-        self.save()
+        if self.stored is not None:
+            self.stored.delete()
+            self._stored = None
+        self._snapshot = None
+        self.session.pop(CART_SESSION_KEY, None)
+        if self.user is not None:
+            self.session[COUNT_SESSION_KEY] = 0
+        else:
+            self.session.pop(COUNT_SESSION_KEY, None)
+
+
+def merge_carts(request, user):
+    """
+    Fold the cart a visitor filled before logging in into the user's stored
+    cart, adding quantities for products in both, and point the session at it.
+    """
+    # A Cart built earlier in this request still belongs to the anonymous visitor.
+    request.__dict__.pop('_cart', None)
+    anonymous = Cart(request)._session_cart()
+    if anonymous is not None and anonymous.user_id not in (None, user.pk):
+        anonymous = None
+    user_cart = StoredCart.objects.filter(user=user).first()
+
+    if anonymous is not None and anonymous != user_cart:
+        with transaction.atomic():
+            if user_cart is None:
+                anonymous.user = user
+                anonymous.save(update_fields=['user', 'updated_at'])
+                user_cart = anonymous
+            else:
+                existing = {line.product_id: line for line in user_cart.lines.all()}
+                moved, merged = [], []
+                for line in anonymous.lines.all():
+                    if line.product_id in existing:
+                        existing[line.product_id].quantity += line.quantity
+                        merged.append(existing[line.product_id])
+                    else:
+                        moved.append(line.pk)
+                CartLine.objects.bulk_update(merged, ['quantity'])
+                CartLine.objects.filter(pk__in=moved).update(cart=user_cart)
+                anonymous.delete()
+                user_cart.refresh_totals()
+
+    if user_cart is not None:
+        request.session[CART_SESSION_KEY] = user_cart.pk
+        request.session[COUNT_SESSION_KEY] = user_cart.item_count
+    else:
+        request.session.pop(CART_SESSION_KEY, None)
+        request.session[COUNT_SESSION_KEY] = 0
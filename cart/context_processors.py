@@ -1,4 +1,6 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+from .cart import get_cart
 
 def cart_context(request):
-    return {'cart': Cart(request)}
+    # Built on first use, so pages that never show the cart don't touch the session.
+    return {'cart': SimpleLazyObject(lambda: get_cart(request))}
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cart.models import StoredCart
+
+class Command(BaseCommand):
+    help = 'Delete anonymous carts that have not changed for a number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Delete anonymous carts idle for this many days')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Users' carts are kept: they are restored at the next login.
+        deleted, per_model = StoredCart.objects.filter(user__isnull=True, updated_at__lt=cutoff).delete()
+        carts = per_model.get(StoredCart._meta.label, 0)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {carts} abandoned carts'))
@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import F, Sum
+from django.contrib.auth.models import User
+from catalog.models import Product
+
+class StoredCart(models.Model):
+    """
+    A shopping cart kept in the database. Anonymous carts are found through
+    a session pointer; a user's cart survives logout and follows them across
+    devices.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='stored_cart')
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        owner = self.user.username if self.user_id else 'anonymous'
+        return f"Cart {self.id} ({owner})"
+
+    def refresh_totals(self):
+        """
+        Recompute the cached quantity and subtotal from the lines.
+        """
+        totals = self.lines.aggregate(
+            item_count=Sum('quantity'),
+            subtotal=Sum(F('price') * F('quantity'), output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+        )
+        self.item_count = totals['item_count'] or 0
+        self.subtotal = totals['subtotal'] or Decimal('0.00')
+        self.save(update_fields=['item_count', 'subtotal', 'updated_at'])
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(StoredCart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['cart', 'product']
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name}"
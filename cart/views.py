@@ -1,15 +1,18 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from catalog.models import Product
-from .cart import Cart
+from .cart import get_cart
 
 def cart_detail(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     return render(request, 'cart/detail.html', {'cart': cart})
 
 @require_POST
 def cart_add(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get('quantity', 1))
     cart.add(product=product, quantity=quantity, override_quantity=True)
@@ -17,7 +20,60 @@ def cart_add(request, product_id):
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
     return redirect('cart:detail')
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+MAX_CART_OPERATIONS = 100
+
+@require_POST
+def cart_batch(request):
+    """
+    Apply several cart changes in one request. Expects a JSON body like
+    ``{"operations": [{"op": "add", "product_id": 3, "quantity": 2}, ...]}``
+    and answers with the resulting lines, subtotal and count. Nothing is
+    changed unless every operation is valid.
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list):
+            raise TypeError
+        parsed = []
+        for operation in operations[:MAX_CART_OPERATIONS + 1]:
+            op = operation['op']
+            quantity = int(operation.get('quantity', 1))
+            if op not in CART_OPERATIONS or quantity < 0 or (op == 'add' and quantity == 0):
+                raise ValueError
+            parsed.append((op, int(operation['product_id']), quantity))
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'error': 'Invalid operations'}, status=400)
+    if len(parsed) > MAX_CART_OPERATIONS:
+        return JsonResponse({'success': False, 'error': f'At most {MAX_CART_OPERATIONS} operations per request'}, status=400)
+    
+    # One lookup for every product the batch mentions.
+    products = Product.objects.filter(available=True).in_bulk({product_id for op, product_id, quantity in parsed})
+    missing = sorted({product_id for op, product_id, quantity in parsed if product_id not in products})
+    if missing:
+        return JsonResponse({'success': False, 'error': 'Unknown products', 'product_ids': missing}, status=400)
+    
+    cart = get_cart(request)
+    cart.apply([(op, products[product_id], quantity) for op, product_id, quantity in parsed])
+    
+    snapshot = cart.snapshot()
+    return JsonResponse({
+        'success': True,
+        'lines': [
+            {
+                'product_id': item.product.id,
+                'name': item.product.name,
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'total_price': str(item.total_price),
+            }
+            for item in snapshot
+        ],
+        'subtotal': str(snapshot.subtotal),
+        'count': snapshot.count,
+    })
@@ -0,0 +1,116 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+VERSION_PREFIX = 'catalog:version:'
+CHANGED_PREFIX = 'catalog:changed:'
+
+# Scopes used to version cached catalog data:
+#   'catalog'         home page and every listing (facet counts span the catalog)
+#   'categories'      the category list
+#   'products'        every product detail page, for bulk writes that skip signals
+#   'product:<slug>'  a single product detail page
+CATALOG = 'catalog'
+CATEGORIES = 'categories'
+PRODUCTS = 'products'
+
+
+def product_scope(slug):
+    return f'product:{slug}'
+
+
+def product_detail_scopes(slug):
+    return [product_scope(slug), CATEGORIES, PRODUCTS]
+
+
+def _initial_version():
+    # Seeding from the clock means a version that was evicted comes back
+    # larger than any value it held before, so stale entries stay unreachable.
+    return int(time.time() * 1000)
+
+
+def get_version(*scopes):
+    """
+    Return a token combining the current version of every scope. Cache keys
+    that embed it go stale as soon as any of the scopes is bumped.
+    """
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = VERSION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+    now = timezone.now()
+    cache.set_many({CHANGED_PREFIX + scope: now for scope in scopes}, timeout=None)
+
+
+def last_changed(*scopes):
+    """
+    Return when any of the scopes was last bumped, or None if unknown. Unlike
+    updated_at this also moves on deletes and category edits.
+    """
+    changed = cache.get_many([CHANGED_PREFIX + scope for scope in scopes]).values()
+    return max(changed, default=None)
+
+
+def _cached(name, scopes, producer):
+    key = f'catalog:{name}:{get_version(*scopes)}'
+    missing = object()
+    value = cache.get(key, missing)
+    if value is missing:
+        value = producer()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def get_listing_modified(name, queryset):
+    """
+    Return the newest updated_at among ``queryset``, recomputed only after
+    the catalog changes.
+    """
+    return _cached(f'modified:{name}', [CATALOG], lambda: queryset.aggregate(Max('updated_at'))['updated_at__max'])
+
+
+def get_categories():
+    from .models import Category
+
+    return _cached('categories', [CATEGORIES], lambda: list(Category.objects.all()))
+
+
+def get_category(slug):
+    for category in get_categories():
+        if category.slug == slug:
+            return category
+    return None
+
+
+def get_product(slug):
+    """
+    Return the available product with ``slug`` or None, with its category
+    attached from the cached category list.
+    """
+    from .models import Product
+
+    product = _cached(
+        f'product:{slug}',
+        [product_scope(slug), PRODUCTS],
+        lambda: Product.objects.filter(slug=slug, available=True).first(),
+    )
+    if product is not None:
+        categories = {category.id: category for category in get_categories()}
+        if product.category_id in categories:
+            product.category = categories[product.category_id]
+    return product
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+
+from cart.cart import get_cart
+
+
+def visitor_state(request):
+    """
+    Return the per-visitor bits that base.html renders around cached catalog
+    content, or None when the response must not be revalidated at all.
+    """
+    if len(get_messages(request)):
+        return None
+    return [
+        request.user.pk,
+        len(get_cart(request)),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+
+
+def make_etag(request, *parts):
+    state = visitor_state(request)
+    if state is None:
+        return None
+    return hashlib.sha256(repr([*parts, *state]).encode()).hexdigest()[:32]
+
+
+def latest(request, *timestamps):
+    """
+    Last-Modified for catalog pages. Only offered to anonymous visitors with
+    an empty cart, since a date cannot express per-visitor changes.
+    """
+    state = visitor_state(request)
+    if state is None or state[0] is not None or state[1]:
+        return None
+    return max((timestamp for timestamp in timestamps if timestamp), default=None)
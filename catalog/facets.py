@@ -0,0 +1,140 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('under-25', 'Under $25', None, Decimal('25')),
+    ('25-50', '$25 to $50', Decimal('25'), Decimal('50')),
+    ('50-100', '$50 to $100', Decimal('50'), Decimal('100')),
+    ('100-250', '$100 to $250', Decimal('100'), Decimal('250')),
+    ('250-500', '$250 to $500', Decimal('250'), Decimal('500')),
+    ('500-up', '$500 & Above', Decimal('500'), None),
+]
+
+PRICE_BAND_KEYS = {key for key, _, _, _ in PRICE_BANDS}
+
+
+def price_band_for(price):
+    for key, _, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return PRICE_BANDS[-1][0]
+
+
+def price_band_q(key):
+    for band_key, _, low, high in PRICE_BANDS:
+        if band_key == key:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    raise ValueError(f'Unknown price band: {key}')
+
+
+def facet_key(product):
+    """
+    Return the (category_id, price_band, in_stock) cell a product is counted
+    in, or None for products hidden from the storefront.
+    """
+    if not product.available:
+        return None
+    return (product.category_id, price_band_for(Decimal(product.price)), product.stock > 0)
+
+
+def adjust(key, delta):
+    from .models import FacetCount
+
+    if key is None:
+        return
+    category_id, price_band, in_stock = key
+    cell, created = FacetCount.objects.get_or_create(
+        category_id=category_id, price_band=price_band, in_stock=in_stock
+    )
+    cells = FacetCount.objects.filter(pk=cell.pk)
+    if delta < 0:
+        cells = cells.filter(count__gte=-delta)
+    cells.update(count=F('count') + delta)
+
+
+def move(old_key, new_key):
+    """
+    Move one product between facet cells, e.g. after an edit or a stock change.
+    """
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        adjust(old_key, -1)
+        adjust(new_key, 1)
+
+
+def rebuild():
+    """
+    Recompute every facet cell with one GROUP BY over the product table.
+    """
+    from .models import FacetCount, Product
+
+    band = Case(
+        *(When(price_band_q(key), then=Value(key)) for key, _, _, _ in PRICE_BANDS),
+        default=Value(PRICE_BANDS[-1][0]),
+    )
+    rows = (
+        Product.objects.filter(available=True)
+        .annotate(band=band, has_stock=Case(When(stock__gt=0, then=Value(True)), default=Value(False)))
+        .values('category_id', 'band', 'has_stock')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    cells = [
+        FacetCount(
+            category_id=row['category_id'],
+            price_band=row['band'],
+            in_stock=row['has_stock'],
+            count=row['total'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(cells)
+    return len(cells)
+
+
+def get_facets(category_id=None, price_band=None, in_stock=False):
+    """
+    Count matching products for every facet value from the maintained cells.
+
+    Each facet is counted with the other active filters applied but not its
+    own, so the numbers show what a shopper gets by switching that facet.
+    """
+    from .models import FacetCount
+
+    category_counts = {}
+    band_counts = dict.fromkeys(PRICE_BAND_KEYS, 0)
+    in_stock_count = 0
+
+    for cell_category, cell_band, cell_in_stock, count in FacetCount.objects.filter(count__gt=0).values_list(
+        'category_id', 'price_band', 'in_stock', 'count'
+    ):
+        category_match = category_id is None or cell_category == category_id
+        band_match = price_band is None or cell_band == price_band
+        stock_match = not in_stock or cell_in_stock
+
+        if band_match and stock_match:
+            category_counts[cell_category] = category_counts.get(cell_category, 0) + count
+        if category_match and stock_match and cell_band in band_counts:
+            band_counts[cell_band] += count
+        if category_match and band_match and cell_in_stock:
+            in_stock_count += count
+
+    return {
+        'categories': category_counts,
+        'price_bands': [
+            {'key': key, 'label': label, 'count': band_counts[key], 'selected': key == price_band}
+            for key, label, _, _ in PRICE_BANDS
+        ],
+        'in_stock': in_stock_count,
+    }
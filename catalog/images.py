@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+
+# Widths generated for each upload_to directory, smallest first.
+WIDTHS = {
+    'products': (160, 320, 640, 1280),
+    'categories': (320, 640, 1280),
+    'profile_images': (40, 80, 160),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def widths_for(name):
+    return WIDTHS.get(name.split('/', 1)[0], ())
+
+
+def fallback_format(name):
+    # Derivatives keep PNG for images that may carry transparency and use
+    # JPEG for everything else; a WebP copy is generated alongside either.
+    return 'png' if name.lower().endswith('.png') else 'jpg'
+
+
+def derivative_name(name, width, extension):
+    stem, _ = os.path.splitext(name)
+    return f'{DERIVATIVES_DIR}/{stem}_{width}w.{extension}'
+
+
+def derivative_names(name):
+    """
+    Return the [(width, fallback name, webp name)] generated for an upload.
+    """
+    extension = fallback_format(name)
+    return [
+        (width, derivative_name(name, width, extension), derivative_name(name, width, 'webp'))
+        for width in widths_for(name)
+    ]
+
+
+def is_ready(name):
+    """
+    True once every derivative of ``name`` exists. The largest WebP is
+    written last, so checking it alone is enough.
+    """
+    names = derivative_names(name)
+    return bool(names) and default_storage.exists(names[-1][2])
+
+
+def render_derivatives(source_path, targets):
+    """
+    Resize ``source_path`` into each (path, width, format) target. Runs in a
+    worker process, so it only touches the filesystem and Pillow.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        for path, width, image_format in targets:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            resized = image.copy()
+            # thumbnail() never upscales, so small uploads are re-encoded as-is.
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            if image_format == 'JPEG' and resized.mode not in ('RGB', 'L'):
+                resized = resized.convert('RGB')
+            options = {'optimize': True}
+            if image_format in ('JPEG', 'WEBP'):
+                options['quality'] = 82
+            tmp_path = f'{path}.tmp'
+            resized.save(tmp_path, image_format, **options)
+            os.replace(tmp_path, path)
+    return len(targets)
+
+
+def build_targets(name, storage=default_storage):
+    fallback = 'PNG' if fallback_format(name) == 'png' else 'JPEG'
+    names = derivative_names(name)
+    return (
+        [(storage.path(fallback_name), width, fallback) for width, fallback_name, _ in names] +
+        [(storage.path(webp_name), width, 'WEBP') for width, _, webp_name in names]
+    )
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def changed(name, created, previous_name):
+    """
+    True when a save stored a new image ``name``: on creation, or when it
+    differs from ``previous_name``. Saves that leave the image alone, such
+    as stock and price updates, pass None as the previous name.
+    """
+    return bool(name) and (created or (previous_name is not None and previous_name != name))
+
+
+def schedule(name, on_done=None):
+    """
+    Queue derivative generation for the stored file ``name`` on the process
+    pool and return immediately. ``on_done`` runs in this process once the
+    files exist, e.g. to invalidate cached pages that embed the image.
+    """
+    if not name or not widths_for(name) or not default_storage.exists(name) or is_ready(name):
+        return None
+
+    future = get_executor().submit(render_derivatives, default_storage.path(name), build_targets(name))
+
+    def finished(future):
+        error = future.exception()
+        if error is not None:
+            logger.error('Generating derivatives for %s failed: %s', name, error)
+        elif on_done is not None:
+            on_done()
+
+    future.add_done_callback(finished)
+    return future
@@ -0,0 +1,313 @@
+import json
+import re
+import statistics
+import subprocess
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from accounts.models import Address
+from catalog.models import Product
+from orders.models import Order
+
+CONVERTER_RE = re.compile(r'<(?:(?P<converter>\w+):)?(?P<name>\w+)>')
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench', 'last_name': 'Mark', 'email': 'bench@example.com', 'phone': '5550100',
+    'address': '1 Load Test Way', 'city': 'Austin', 'postal_code': '73301', 'country': 'USA',
+}
+
+class QueryCounter:
+    """
+    Count queries through an execute wrapper. CaptureQueriesContext can't be
+    used around a request: request_started clears the query log it slices.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class Command(BaseCommand):
+    help = 'Measure latency, throughput and SQL queries for every named route against the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route before measuring')
+        parser.add_argument('--time-limit', type=float, default=30.0,
+                            help='Stop timing a route after this many seconds, keeping the samples taken so far')
+        parser.add_argument('--routes', help='Only run routes whose name matches this regular expression')
+        parser.add_argument('--exclude', action='append', default=['admin/'],
+                            help='Skip URL prefixes (default: the Django admin site)')
+        parser.add_argument('--payment-latency', type=float, default=0.0,
+                            help='Seconds the fake payment gateway takes per payment intent')
+        parser.add_argument('--output', default='bench_results.json', help='Write machine-readable results here')
+        parser.add_argument('--compare', help='Earlier results file to report deltas against')
+
+    def handle(self, *args, **options):
+        if not Product.objects.filter(available=True).exists():
+            raise CommandError('No products found; seed the database first (generate_dataset --products N).')
+
+        # Routes under test place orders, move stock and change statuses; run
+        # everything in one transaction and roll it back so the database is
+        # left as it was found.
+        with transaction.atomic():
+            self.fixtures = self.prepare_fixtures()
+            self.client = Client(raise_request_exception=False)
+            self.client.force_login(self.fixtures.staff)
+
+            pattern = re.compile(options['routes']) if options['routes'] else None
+            routes = [
+                route for route in self.collect_routes(get_resolver().url_patterns, '', None)
+                if not any(route['path'].startswith(prefix) for prefix in options['exclude'])
+                and (pattern is None or pattern.search(route['name']))
+            ]
+
+            results = []
+            # The in-process gateway keeps runs offline; its latency stands in for the real round trip.
+            # The test client's host must be allowed, or every route answers 400.
+            with override_settings(
+                PAYMENT_GATEWAY='payments.gateways.FakeGateway', FAKE_PAYMENT_LATENCY=options['payment_latency'],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                for route in routes:
+                    result = self.measure(route, options['iterations'], options['warmup'], options['time_limit'])
+                    results.append(result)
+                    self.print_result(result)
+
+            report = {
+                'timestamp': timezone.now().isoformat(),
+                'commit': self.git_commit(),
+                'iterations': options['iterations'],
+                'dataset': {
+                    'products': Product.objects.count(),
+                    'users': User.objects.count(),
+                    'orders': Order.objects.count(),
+                },
+                'routes': results,
+            }
+            transaction.set_rollback(True)
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} route results to {options["output"]}'))
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def prepare_fixtures(self):
+        staff, created = User.objects.get_or_create(
+            username='benchmark', defaults={'email': 'benchmark@example.com', 'is_staff': True, 'is_superuser': True}
+        )
+        customer, created = User.objects.get_or_create(
+            username='benchmark_customer', defaults={'email': 'customer@example.com'}
+        )
+        product = Product.objects.filter(available=True).select_related('category').order_by('-id').first()
+        address, created = Address.objects.get_or_create(
+            user=staff, address_type='home',
+            defaults={'address': '1 Load Test Way', 'city': 'Austin', 'postal_code': '73301', 'country': 'USA'},
+        )
+        order = Order.objects.filter(user=staff).first() or Order.objects.create(
+            user=staff, total_price=product.price, **CHECKOUT_FORM
+        )
+
+        faq = None
+        try:
+            from admin.models import FAQ
+            faq = FAQ.objects.first() or FAQ.objects.create(
+                category=product.category, question='Benchmark question?', answer='Benchmark answer.'
+            )
+        except (ImportError, RuntimeError):
+            pass
+
+        return SimpleNamespace(
+            staff=staff, customer=customer, product=product, category=product.category,
+            address=address, order=order, faq=faq,
+        )
+
+    def url_kwargs(self):
+        f = self.fixtures
+        return {
+            'slug': f.product.slug,
+            'category_slug': f.category.slug,
+            'product_id': f.product.id,
+            'category_id': f.category.id,
+            'order_id': f.order.id,
+            'user_id': f.customer.id,
+            'address_id': f.address.id,
+            'faq_id': f.faq.id if f.faq else 0,
+        }
+
+    def scenarios(self):
+        """
+        Requests that need a method, body or untimed setup other than a plain GET.
+        """
+        product = self.fixtures.product
+        add_to_cart = lambda: self.client.post(f'/cart/add/{product.id}/', {'quantity': 1})
+
+        def restock_and_add_to_cart():
+            # Every checkout reserves a unit; put it back so the product never sells out mid-run.
+            Product.objects.filter(pk=product.pk).update(stock=F('stock') + 1)
+            add_to_cart()
+
+        return {
+            'cart:add': {'method': 'post', 'data': {'quantity': 1}},
+            'cart:remove': {'method': 'post', 'before': add_to_cart},
+            'cart:detail': {'before': add_to_cart},
+            'cart:batch': {
+                'method': 'post', 'content_type': 'application/json',
+                # Setting before adding leaves the cart the same after every request.
+                'data': json.dumps({'operations': [
+                    {'op': 'set', 'product_id': product.id, 'quantity': 2},
+                    {'op': 'add', 'product_id': product.id, 'quantity': 1},
+                ]}),
+            },
+            'orders:checkout': {'method': 'post', 'data': CHECKOUT_FORM, 'before': restock_and_add_to_cart},
+            'orders:payment_success': {'query': f'?order_id={self.fixtures.order.id}'},
+            'admin:update_order_status': {'method': 'post', 'data': {'status': 'processing'}},
+            'admin:bulk_update_order_status': {
+                'method': 'post', 'data': {'status': 'processing', 'order_ids': [self.fixtures.order.id]},
+            },
+            'admin:toggle_user_status': {'method': 'post', 'data': {'activate': 'true'}},
+            'admin:toggle_faq_status': {'method': 'post'},
+            'stripe_webhook': {
+                'method': 'post', 'content_type': 'application/json',
+                'data': json.dumps({
+                    'id': 'evt_benchmark',
+                    'type': 'payment_intent.succeeded',
+                    'data': {'object': {'id': 'pi_benchmark', 'metadata': {'order_id': self.fixtures.order.id}}},
+                }),
+                'headers': {'HTTP_STRIPE_SIGNATURE': 'benchmark'},
+            },
+        }
+
+    def collect_routes(self, patterns, prefix, namespace):
+        for entry in patterns:
+            route = str(entry.pattern)
+            if isinstance(entry, URLResolver):
+                child_namespace = entry.namespace or namespace
+                yield from self.collect_routes(entry.url_patterns, prefix + route, child_namespace)
+            elif isinstance(entry, URLPattern) and entry.name:
+                name = f'{namespace}:{entry.name}' if namespace else entry.name
+                yield {'name': name, 'path': prefix + route}
+
+    def build_url(self, path):
+        kwargs = self.url_kwargs()
+
+        def substitute(match):
+            name = match.group('name')
+            if name not in kwargs:
+                raise KeyError(name)
+            return str(kwargs[name])
+
+        return '/' + CONVERTER_RE.sub(substitute, path)
+
+    def measure(self, route, iterations, warmup, time_limit):
+        scenario = self.scenarios().get(route['name'], {})
+        try:
+            url = self.build_url(route['path']) + scenario.get('query', '')
+        except KeyError as e:
+            return {'name': route['name'], 'path': route['path'], 'skipped': f'no value for <{e.args[0]}>'}
+
+        method = getattr(self.client, scenario.get('method', 'get'))
+        request_kwargs = {'data': scenario.get('data')}
+        if 'content_type' in scenario:
+            request_kwargs['content_type'] = scenario['content_type']
+        request_kwargs.update(scenario.get('headers', {}))
+        before = scenario.get('before')
+
+        timings, query_counts, statuses = [], [], {}
+        deadline = time.monotonic() + time_limit
+        for i in range(warmup + iterations):
+            if before:
+                with TestCase.captureOnCommitCallbacks(execute=True):
+                    before()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                # Nothing commits inside the outer transaction, so run the
+                # on_commit work a real commit would trigger as part of the request.
+                with TestCase.captureOnCommitCallbacks(execute=True):
+                    response = method(url, **request_kwargs)
+                    if response.streaming:
+                        # The body of a streaming response is produced as it is read.
+                        for chunk in response.streaming_content:
+                            pass
+                elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+            timings.append(elapsed)
+            query_counts.append(counter.count)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            # Pathologically slow pages would otherwise stall the whole run.
+            if time.monotonic() > deadline:
+                break
+
+        total = sum(timings)
+        return {
+            'name': route['name'],
+            'path': route['path'],
+            'url': url,
+            'method': scenario.get('method', 'get').upper(),
+            'samples': len(timings),
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(self.percentile(timings, 95) * 1000, 2),
+            'mean_ms': round(total / len(timings) * 1000, 2),
+            'requests_per_sec': round(len(timings) / total, 1) if total else None,
+            'queries_median': statistics.median(query_counts),
+            'queries_max': max(query_counts),
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    @staticmethod
+    def percentile(values, percent):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def print_result(self, result):
+        if 'skipped' in result:
+            self.stdout.write(f'{result["name"]:<36} skipped ({result["skipped"]})')
+            return
+        statuses = ','.join(f'{code}x{count}' for code, count in result['statuses'].items())
+        line = (
+            f'{result["name"]:<36} p50 {result["p50_ms"]:>8.2f}ms  p95 {result["p95_ms"]:>8.2f}ms  '
+            f'{result["requests_per_sec"]:>8.1f} req/s  {result["queries_median"]:>5g} queries  [{statuses}]'
+        )
+        if any(not code.startswith(('2', '3')) for code in result['statuses']):
+            line = self.style.WARNING(line)
+        self.stdout.write(line)
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = {route['name']: route for route in json.load(f)['routes'] if 'skipped' not in route}
+
+        self.stdout.write(f'\nChange against {path}:')
+        for result in results:
+            before = previous.get(result['name'])
+            if before is None or 'skipped' in result:
+                continue
+            delta = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            queries = result['queries_median'] - before['queries_median']
+            line = f'{result["name"]:<36} p50 {delta:+7.1f}%  queries {queries:+g}'
+            if delta > 10 or queries > 0:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
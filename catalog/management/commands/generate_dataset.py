@@ -0,0 +1,217 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import Address, Profile
+from catalog.models import Category, Product
+from orders.models import Order, OrderItem
+from wishlist.models import Wishlist
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Ali', 'Maria', 'Chen', 'Fatima', 'Noah', 'Aisha', 'Lucas', 'Sofia', 'Omar', 'Mia']
+LAST_NAMES = ['Smith', 'Khan', 'Garcia', 'Chen', 'Ahmed', 'Muller', 'Rossi', 'Silva', 'Kim', 'Nowak',
+              'Brown', 'Lopez', 'Ivanov', 'Tanaka', 'Dubois', 'Hassan', 'Jones', 'Patel', 'Cohen', 'Olsen']
+CITIES = [('London', 'UK'), ('Berlin', 'Germany'), ('Karachi', 'Pakistan'), ('Austin', 'USA'),
+          ('Toronto', 'Canada'), ('Madrid', 'Spain'), ('Lagos', 'Nigeria'), ('Osaka', 'Japan')]
+STREETS = ['Main St', 'High St', 'Park Ave', 'Station Rd', 'Church Ln', 'Mill Rd', 'King St', 'Lake Dr']
+
+# Roughly how a live store's orders are spread across statuses.
+STATUS_WEIGHTS = {
+    'pending': 8, 'confirmed': 10, 'processing': 7, 'shipped': 15, 'delivered': 55, 'cancelled': 5,
+}
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible dataset of users, orders and wishlists for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to create (each with a profile and address)')
+        parser.add_argument('--orders', type=int, default=50000, help='Orders to create')
+        parser.add_argument('--products', type=int, default=0, help='Extra synthetic products to create first')
+        parser.add_argument('--wishlist-per-user', type=float, default=2.0, help='Average wishlist entries per user')
+        parser.add_argument('--days', type=int, default=365, help='Spread join and order dates over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', default='synth', help='Username prefix, change it to add a second dataset')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        self.started = time.monotonic()
+
+        if options['products']:
+            self.create_products(options['products'], options['prefix'])
+
+        products = list(Product.objects.filter(available=True).values_list('id', 'price').order_by('id'))
+        if not products and options['orders']:
+            raise CommandError('No products to order; pass --products or import a catalog first.')
+
+        user_ids = self.create_users(options['users'], options['prefix'])
+        if products and user_ids:
+            self.create_orders(options['orders'], user_ids, products)
+            self.create_wishlists(user_ids, [pk for pk, _ in products], options['wishlist_per_user'])
+
+        # bulk_create skips the signals that keep the dashboard rollup and
+        # the product, category and customer stats current.
+        if apps.is_installed('admin'):
+            call_command('refresh_metrics', stdout=self.stdout)
+            call_command('rebuild_stats', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f'Dataset generated in {time.monotonic() - self.started:.1f}s'))
+
+    def progress(self, label, done, total):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'{label}: {done}/{total} ({elapsed:.0f}s elapsed)')
+
+    def random_moment(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def create_products(self, count, prefix):
+        categories = list(Category.objects.all())
+        if not categories:
+            categories = [Category.objects.create(name=f'{prefix.title()} Category {i}') for i in range(10)]
+
+        for start in range(0, count, self.chunk_size):
+            batch = [
+                Product(
+                    category=self.rng.choice(categories),
+                    name=f'{prefix.title()} Product {i}',
+                    slug=f'{prefix}-product-{i}',
+                    description=f'Synthetic product {i} for load testing.',
+                    price=Decimal(self.rng.lognormvariate(3.5, 1.0)).quantize(Decimal('0.01')),
+                    stock=self.rng.choice([0, 1, 5, 10, 25, 100]),
+                    image='',
+                )
+                for i in range(start, min(start + self.chunk_size, count))
+            ]
+            Product.objects.bulk_create(batch)
+            self.progress('products', start + len(batch), count)
+
+        # bulk_create skips the signals that maintain these.
+        call_command('rebuild_facet_counts', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+
+    def create_users(self, count, prefix):
+        # Hashing is deliberately slow, so every synthetic user shares one hash.
+        password = make_password('password')
+        user_ids = []
+
+        for start in range(0, count, self.chunk_size):
+            end = min(start + self.chunk_size, count)
+            users = []
+            for i in range(start, end):
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                users.append(User(
+                    username=f'{prefix}{i}',
+                    email=f'{prefix}{i}@example.com',
+                    first_name=first,
+                    last_name=last,
+                    password=password,
+                    is_active=self.rng.random() > 0.03,
+                    date_joined=self.random_moment(),
+                ))
+
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                profiles, addresses = [], []
+                for user in users:
+                    city, country = self.rng.choice(CITIES)
+                    street = f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}'
+                    postal_code = f'{self.rng.randint(10000, 99999)}'
+                    profiles.append(Profile(
+                        user=user, phone=f'+1{self.rng.randint(2000000000, 9999999999)}',
+                        address=street, city=city, postal_code=postal_code, country=country,
+                    ))
+                    addresses.append(Address(
+                        user=user, address_type=self.rng.choice(['home', 'work', 'other']),
+                        address=street, city=city, postal_code=postal_code, country=country, is_default=True,
+                    ))
+                Profile.objects.bulk_create(profiles)
+                Address.objects.bulk_create(addresses)
+
+            user_ids.extend(user.id for user in users)
+            self.progress('users', end, count)
+        return user_ids
+
+    def create_orders(self, count, user_ids, products):
+        # Popularity follows a Zipf-like curve: a few products dominate sales.
+        cum_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(products))))
+        ranked = products[:]
+        self.rng.shuffle(ranked)
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        names = dict(Product.objects.filter(available=True).values_list('id', 'name'))
+
+        # created_at is auto_now_add; switch it off so orders keep their spread-out dates.
+        created_at = Order._meta.get_field('created_at')
+        created_at.auto_now_add = False
+        try:
+            for start in range(0, count, self.chunk_size):
+                end = min(start + self.chunk_size, count)
+                orders, lines = [], []
+                for i in range(start, end):
+                    # Basket sizes: mostly one or two lines, with a long tail.
+                    size = min(1 + int(self.rng.expovariate(0.7)), 20)
+                    picked = {pk: price for pk, price in self.rng.choices(ranked, cum_weights=cum_weights, k=size)}
+                    items = [(pk, price, self.rng.choice([1, 1, 1, 1, 2, 2, 3, 5])) for pk, price in picked.items()]
+                    status = self.rng.choices(statuses, weights)[0]
+                    first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                    city, country = self.rng.choice(CITIES)
+                    moment = self.random_moment()
+                    order = Order(
+                        user_id=self.rng.choice(user_ids),
+                        first_name=first,
+                        last_name=last,
+                        email=f'{first}.{last}{i}@example.com'.lower(),
+                        phone=f'+1{self.rng.randint(2000000000, 9999999999)}',
+                        address=f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}',
+                        city=city,
+                        postal_code=f'{self.rng.randint(10000, 99999)}',
+                        country=country,
+                        total_price=sum(price * quantity for _, price, quantity in items),
+                        status=status,
+                        stripe_payment_id='' if status in ('pending', 'cancelled') else f'pi_synthetic_{i}',
+                        created_at=moment,
+                    )
+                    order.summarize_items((names[pk], quantity) for pk, _, quantity in items)
+                    orders.append(order)
+                    lines.append(items)
+
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    OrderItem.objects.bulk_create(
+                        [
+                            OrderItem(order=order, product_id=pk, price=price, quantity=quantity)
+                            for order, items in zip(orders, lines)
+                            for pk, price, quantity in items
+                        ],
+                        batch_size=self.chunk_size,
+                    )
+                self.progress('orders', end, count)
+        finally:
+            created_at.auto_now_add = True
+
+    def create_wishlists(self, user_ids, product_ids, per_user):
+        entries = []
+        total = 0
+        for user_id in user_ids:
+            size = min(int(self.rng.expovariate(1 / per_user)) if per_user else 0, len(product_ids))
+            for product_id in self.rng.sample(product_ids, size):
+                entries.append(Wishlist(user_id=user_id, product_id=product_id))
+            if len(entries) >= self.chunk_size:
+                Wishlist.objects.bulk_create(entries, ignore_conflicts=True)
+                total += len(entries)
+                entries = []
+        if entries:
+            Wishlist.objects.bulk_create(entries, ignore_conflicts=True)
+            total += len(entries)
+        self.progress('wishlist entries', total, total)
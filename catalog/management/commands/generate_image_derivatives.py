@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from accounts.models import Profile
+from catalog import caching
+from catalog.images import build_targets, is_ready, render_derivatives, widths_for
+from catalog.models import Category, Product
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and WebP variants for existing product, category and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_DERIVATIVE_WORKERS, help='Worker processes')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+
+    def handle(self, *args, **options):
+        sources = [
+            Product.objects.exclude(image='').values_list('image', flat=True),
+            Category.objects.exclude(image='').values_list('image', flat=True),
+            Profile.objects.exclude(profile_image='').values_list('profile_image', flat=True),
+        ]
+        max_pending = options['workers'] * 4
+        generated = skipped = failed = 0
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            pending = {}
+            for queryset in sources:
+                for name in queryset.iterator(chunk_size=1000):
+                    if not widths_for(name) or not default_storage.exists(name):
+                        skipped += 1
+                        continue
+                    if not options['force'] and is_ready(name):
+                        skipped += 1
+                        continue
+                    # Keep a bounded number of jobs in flight so memory stays flat.
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            ok = self._report(pending.pop(future), future)
+                            generated += ok
+                            failed += not ok
+                    future = executor.submit(render_derivatives, default_storage.path(name), build_targets(name))
+                    pending[future] = name
+
+            for future in wait(pending).done:
+                ok = self._report(pending[future], future)
+                generated += ok
+                failed += not ok
+
+        # Cached pages rendered before the derivatives existed lack srcsets.
+        if generated:
+            caching.bump(caching.CATALOG, caching.CATEGORIES, caching.PRODUCTS)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated derivatives for {generated} images in {elapsed:.1f}s '
+            f'({skipped} skipped, {failed} failed)'
+        ))
+
+    def _report(self, name, future):
+        error = future.exception()
+        if error is not None:
+            self.stderr.write(f'{name}: {error}')
+            return False
+        return True
@@ -0,0 +1,172 @@
+import csv
+import gzip
+import hashlib
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+from catalog import caching, facets
+from catalog.models import Category, Product
+from catalog.search import get_search_backend
+
+# Always written on upsert; the rest only when the feed has the column.
+UPDATE_FIELDS = ['category', 'name', 'updated_at']
+OPTIONAL_FIELDS = ['description', 'price', 'stock', 'available', 'image']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+class Command(BaseCommand):
+    help = 'Stream products from CSV or JSONL files and upsert them by slug in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV or JSONL files, optionally gzipped')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Products upserted per statement')
+        parser.add_argument('--no-index', action='store_true', help='Skip updating the search index')
+
+    def handle(self, *args, **options):
+        self.categories = {category.name: category for category in Category.objects.all()}
+        self.search_backend = None if options['no_index'] else get_search_backend()
+        batch_size = options['batch_size']
+
+        self.rows = self.imported = self.skipped = 0
+        self.touched_categories = set()
+        self.started = self.last_report = time.monotonic()
+
+        for path in options['paths']:
+            batch = {}
+            for line_number, record in self.read(path, options['format']):
+                self.rows += 1
+                product = self.build_product(path, line_number, record)
+                if product is None:
+                    self.skipped += 1
+                    continue
+                # A slug may only appear once per upsert statement; the last row wins.
+                batch[product.slug] = product, [name for name in OPTIONAL_FIELDS if name in record]
+                if len(batch) >= batch_size:
+                    self.flush(batch)
+                    batch = {}
+            if batch:
+                self.flush(batch)
+
+        # Bulk writes bypass model signals, so refresh the derived data once.
+        facets.rebuild()
+        caching.bump(caching.CATALOG, caching.CATEGORIES, caching.PRODUCTS)
+        if apps.is_installed('admin'):
+            from admin import stats
+            stats.refresh_categories(self.touched_categories)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} products from {self.rows} rows in {elapsed:.1f}s '
+            f'({self.rows / max(elapsed, 1e-9):.0f} rows/sec, {self.skipped} skipped)'
+        ))
+
+    def read(self, path, file_format):
+        file_format = file_format or ('jsonl' if '.json' in path else 'csv')
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            handle = opener(path, 'rt', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+        with handle:
+            if file_format == 'csv':
+                # Line 1 is the header row.
+                for line_number, record in enumerate(csv.DictReader(handle), start=2):
+                    yield line_number, record
+            else:
+                for line_number, line in enumerate(handle, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as e:
+                        self.rows += 1
+                        self.skipped += 1
+                        self.warn(path, line_number, f'invalid JSON: {e}')
+
+    def build_product(self, path, line_number, record):
+        name = (record.get('name') or '').strip()
+        category_name = (record.get('category') or '').strip()
+        if not name or not category_name:
+            self.warn(path, line_number, 'name and category are required')
+            return None
+
+        try:
+            price = Decimal(str(record.get('price') or '0')).quantize(Decimal('0.01'))
+            stock = int(record.get('stock') or 0)
+        except (InvalidOperation, ValueError):
+            self.warn(path, line_number, 'invalid price or stock')
+            return None
+        if price < 0 or stock < 0:
+            self.warn(path, line_number, 'price and stock must not be negative')
+            return None
+
+        available = record.get('available', True)
+        if isinstance(available, str):
+            available = available.strip().lower() in TRUE_VALUES
+
+        # Names without any ASCII letters or digits slugify to ''; derive a
+        # stable slug from the name so re-imports still match the same row.
+        slug = record.get('slug') or slugify(name) or f"product-{hashlib.sha1(name.encode()).hexdigest()[:12]}"
+
+        category = self.get_category(category_name)
+        return Product(
+            category=category,
+            name=name[:200],
+            slug=slug[:50],
+            description=record.get('description') or '',
+            price=price,
+            stock=stock,
+            available=bool(available),
+            image=record.get('image') or '',
+        )
+
+    def get_category(self, name):
+        category = self.categories.get(name)
+        if category is None:
+            category, created = Category.objects.get_or_create(name=name)
+            self.categories[name] = category
+        return category
+
+    def flush(self, batch):
+        # Rows only overwrite the columns their feed provides, so upsert each
+        # set of columns in its own statement. Files usually have just one.
+        groups = {}
+        for product, fields in batch.values():
+            groups.setdefault(tuple(fields), []).append(product)
+        with transaction.atomic():
+            # Products moving category change the counts of the one they leave too.
+            self.touched_categories.update(
+                Product.objects.filter(slug__in=batch.keys()).values_list('category_id', flat=True)
+            )
+            self.touched_categories.update(product.category_id for product, _ in batch.values())
+            for fields, products in groups.items():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['slug'],
+                    update_fields=UPDATE_FIELDS + list(fields),
+                )
+            if self.search_backend is not None:
+                # Re-read by slug: not every backend returns primary keys for upserted rows.
+                self.search_backend.index(
+                    list(Product.objects.filter(slug__in=batch.keys()).select_related('category'))
+                )
+        self.imported += len(batch)
+
+        now = time.monotonic()
+        if now - self.last_report >= 5:
+            self.last_report = now
+            self.stdout.write(
+                f'{self.rows} rows, {self.imported} imported '
+                f'({self.rows / (now - self.started):.0f} rows/sec)'
+            )
+
+    def warn(self, path, line_number, message):
+        self.stderr.write(f'{path}:{line_number}: {message}')
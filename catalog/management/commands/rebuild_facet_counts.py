@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from catalog import facets
+
+class Command(BaseCommand):
+    help = 'Recompute the storefront facet counts from the product table'
+
+    def handle(self, *args, **options):
+        cells = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} facet cells'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from catalog.models import Product
+from catalog.search import get_search_backend, index_queryset
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Products indexed per batch')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.monotonic()
+
+        backend.clear()
+        total = index_queryset(
+            Product.objects.filter(available=True).order_by('id'),
+            batch_size=options['batch_size'],
+            backend=backend,
+        )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} products with {type(backend).__name__} in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_facet_counts(apps, schema_editor):
+    from catalog.facets import price_band_for
+
+    Product = apps.get_model('catalog', 'Product')
+    FacetCount = apps.get_model('catalog', 'FacetCount')
+    cells = {}
+    rows = (
+        Product.objects.filter(available=True)
+        .values('category_id', 'price', 'stock')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        key = (row['category_id'], price_band_for(row['price']), row['stock'] > 0)
+        cells[key] = cells.get(key, 0) + row['total']
+    FacetCount.objects.bulk_create(
+        FacetCount(category_id=category_id, price_band=band, in_stock=in_stock, count=count)
+        for (category_id, band, in_stock), count in cells.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_band', models.CharField(max_length=20)),
+                ('in_stock', models.BooleanField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='catalog.category')),
+            ],
+            options={
+                'unique_together': {('category', 'price_band', 'in_stock')},
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -31,6 +31,12 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['available', '-created_at', '-id'], name='product_listing_idx'),
+            models.Index(fields=['category', 'available', '-created_at', '-id'], name='product_category_listing_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -41,3 +47,16 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+class FacetCount(models.Model):
+    """Number of available products per (category, price band, in stock) cell."""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facet_counts')
+    price_band = models.CharField(max_length=20)
+    in_stock = models.BooleanField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['category', 'price_band', 'in_stock']
+
+    def __str__(self):
+        return f"{self.category_id}/{self.price_band}/{'in stock' if self.in_stock else 'out of stock'}: {self.count}"
@@ -0,0 +1,127 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a unique ordering such as ('-created_at', '-id').
+
+    Each page is a single indexed range query of per_page + 1 rows, so deep
+    pages cost the same as the first one and no COUNT(*) is ever issued.
+    Cursors are opaque tokens holding the ordering values of the boundary row.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        try:
+            direction, values = self.decode(cursor) if cursor else ('n', None)
+        except InvalidCursor:
+            direction, values = 'n', None
+
+        backwards = direction == 'p'
+        ordering = [self._reverse(name) for name in self.ordering] if backwards else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else values is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode('n', rows[-1]) if has_next else None,
+            previous_cursor=self.encode('p', rows[0]) if has_previous else None,
+        )
+
+    def encode(self, direction, obj):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            values.append(None if value is None else str(value))
+        raw = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+
+        opts = self.queryset.model._meta
+        try:
+            values = [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+        # The ordering columns are never null, and None can't be compared against.
+        if None in values:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _after(self, values, backwards):
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y), with the
+        # comparison flipped per field for descending columns.
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != backwards else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (prev_name, _) in enumerate(self.fields[:i]):
+                term &= Q(**{prev_name: values[j]})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
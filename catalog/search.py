@@ -0,0 +1,160 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'catalog_product_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """
+    Product search backends keep an index of available products and return
+    matching product ids ordered by relevance.
+    """
+
+    def index(self, products):
+        raise NotImplementedError
+
+    def remove(self, product_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, offset=0):
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Portable fallback that searches the product table directly. Nothing is
+    indexed, so the write hooks are no-ops.
+    """
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit, offset=0):
+        from .models import Product
+
+        terms = TOKEN_RE.findall(query)
+        if not terms:
+            return []
+
+        products = Product.objects.filter(available=True)
+        for term in terms:
+            products = products.filter(
+                Q(name__icontains=term) |
+                Q(description__icontains=term) |
+                Q(category__name__icontains=term)
+            )
+        return list(
+            products.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit]
+        )
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index keyed on the product id, ranked with BM25 so that name
+    matches outweigh category matches, which outweigh description matches.
+    """
+
+    # BM25 column weights for (name, description, category).
+    weights = (10.0, 1.0, 4.0)
+
+    def index(self, products):
+        rows = [
+            (product.id, product.name, product.description, product.category.name)
+            for product in products
+            if product.available
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(product.id,) for product in products])
+            if rows:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+                    rows,
+                )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query, limit, offset=0):
+        match = self.build_match(query)
+        if not match:
+            return []
+
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def build_match(query):
+        # Quote every token so user input can never be parsed as FTS5 syntax,
+        # and prefix-match the last one to support search-as-you-type.
+        terms = TOKEN_RE.findall(query.lower())
+        if not terms:
+            return ''
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+
+def get_search_backend():
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', '')
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    return DatabaseSearchBackend()
+
+
+def index_queryset(queryset, batch_size=2000, backend=None):
+    """
+    Feed ``queryset`` to the search backend in fixed-size batches and return
+    the number of products processed.
+    """
+    backend = backend or get_search_backend()
+    batch = []
+    total = 0
+    for product in queryset.select_related('category').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        backend.index(batch)
+        total += len(batch)
+    return total
+
+
+def search_products(query, limit, offset=0):
+    """
+    Return available products matching ``query`` in relevance order.
+    """
+    from .models import Product
+
+    ids = get_search_backend().search(query, limit, offset)
+    products = Product.objects.filter(id__in=ids, available=True).select_related('category').in_bulk()
+    return [products[pk] for pk in ids if pk in products]
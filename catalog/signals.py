@@ -0,0 +1,97 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, facets, images
+from .models import Category, Product
+from .search import get_search_backend, index_queryset
+
+# Saves that only touch these fields leave the search document unchanged.
+SEARCH_FIELDS = {'name', 'description', 'category', 'category_id', 'available'}
+
+# Fields whose previous values are needed to update facets and cache versions.
+TRACKED_FIELDS = {'category', 'category_id', 'price', 'stock', 'available', 'slug', 'image'}
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_state(sender, instance, update_fields=None, **kwargs):
+    instance._previous = None
+    if instance.pk is None or (update_fields is not None and not TRACKED_FIELDS.intersection(update_fields)):
+        return
+    instance._previous = Product.objects.filter(pk=instance.pk).values(
+        'category_id', 'price', 'stock', 'available', 'slug', 'image'
+    ).first()
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_image(sender, instance, update_fields=None, **kwargs):
+    instance._previous_image = None
+    if instance.pk is None or (update_fields is not None and 'image' not in update_fields):
+        return
+    instance._previous_image = Category.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def update_facet_counts(sender, instance, created, **kwargs):
+    if created:
+        facets.adjust(facets.facet_key(instance), 1)
+    elif instance._previous is not None:
+        previous = {key: value for key, value in instance._previous.items() if key not in ('slug', 'image')}
+        facets.move(facets.facet_key(Product(**previous)), facets.facet_key(instance))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index([instance])
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    slugs = {instance.slug}
+    if instance._previous is not None:
+        slugs.add(instance._previous['slug'])
+    # Bumping before commit would let a concurrent request cache the old
+    # row under the new version.
+    scopes = [caching.product_scope(slug) for slug in slugs]
+    transaction.on_commit(partial(caching.bump, caching.CATALOG, *scopes))
+
+
+@receiver(post_save, sender=Product)
+def generate_product_images(sender, instance, created, **kwargs):
+    previous_image = instance._previous['image'] if instance._previous is not None else None
+    if not images.changed(instance.image.name, created, previous_image):
+        return
+    on_done = partial(caching.bump, caching.CATALOG, caching.product_scope(instance.slug))
+    transaction.on_commit(partial(images.schedule, instance.image.name, on_done))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove([instance.id])
+    facets.adjust(facets.facet_key(instance), -1)
+    transaction.on_commit(partial(caching.bump, caching.CATALOG, caching.product_scope(instance.slug)))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    index_queryset(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    transaction.on_commit(partial(caching.bump, caching.CATALOG, caching.CATEGORIES))
+
+
+@receiver(post_save, sender=Category)
+def generate_category_images(sender, instance, created, **kwargs):
+    if not images.changed(instance.image.name, created, instance._previous_image):
+        return
+    on_done = partial(caching.bump, caching.CATALOG, caching.CATEGORIES)
+    transaction.on_commit(partial(images.schedule, instance.image.name, on_done))
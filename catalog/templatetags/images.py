@@ -0,0 +1,28 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from catalog.images import derivative_names, is_ready
+
+register = template.Library()
+
+
+@register.inclusion_tag('catalog/includes/responsive_image.html')
+def responsive_image(image, alt='', css_class='', sizes='100vw', style=''):
+    """
+    Render ``image`` as a <picture> with WebP and fallback srcsets once its
+    derivatives exist, or as a plain <img> of the original until then.
+    """
+    context = {
+        'url': image.url,
+        'alt': alt,
+        'css_class': css_class,
+        'sizes': sizes,
+        'style': style,
+        'srcset': '',
+        'webp_srcset': '',
+    }
+    if is_ready(image.name):
+        names = derivative_names(image.name)
+        context['srcset'] = ', '.join(f'{default_storage.url(name)} {width}w' for width, name, _ in names)
+        context['webp_srcset'] = ', '.join(f'{default_storage.url(name)} {width}w' for width, _, name in names)
+    return context
@@ -5,6 +5,8 @@ app_name = 'catalog'
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('products/', views.product_list, name='product_list'),
+    path('search/', views.search, name='search'),
     path('category/<slug:category_slug>/', views.product_list, name='category'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
 ]
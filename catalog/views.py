@@ -1,27 +1,144 @@
-from django.shortcuts import render, get_object_or_404
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+from . import caching
+from .conditional import latest, make_etag
 from .models import Product, Category
+from .facets import PRICE_BAND_KEYS, get_facets, price_band_q
+from .pagination import KeysetPaginator
+from .search import search_products
+
+PRODUCTS_PER_PAGE = 24
+
+def _filter_query(filters, **changes):
+    query = {**filters, **changes}
+    return urlencode({key: value for key, value in query.items() if value})
+
+# Querysets handed to catalog templates stay lazy: they only hit the database
+# when the {% cache %} fragment that uses them has to be re-rendered.
 
 def home(request):
     featured_products = Product.objects.filter(available=True)[:8]
     categories = Category.objects.all()
     return render(request, 'catalog/home.html', {
         'featured_products': featured_products,
-        'categories': categories
+        'categories': categories,
+        'cache_version': caching.get_version(caching.CATALOG),
+        'cache_timeout': settings.CATALOG_CACHE_TIMEOUT,
     })
 
-def product_list(request, category_slug=None):
+def _listing(request, category_slug):
     category = None
     products = Product.objects.filter(available=True)
     
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
+        category = caching.get_category(category_slug)
+        if category is None:
+            raise Http404('No Category matches the given query.')
         products = products.filter(category=category)
     
+    # Facet filters
+    price_band = request.GET.get('price')
+    if price_band not in PRICE_BAND_KEYS:
+        price_band = None
+    in_stock = request.GET.get('in_stock') == '1'
+    
+    if price_band:
+        products = products.filter(price_band_q(price_band))
+    if in_stock:
+        products = products.filter(stock__gt=0)
+    
+    filters = {'price': price_band, 'in_stock': '1' if in_stock else None}
+    return category, products, filters
+
+def _product_list_etag(request, category_slug=None):
+    category, products, filters = _listing(request, category_slug)
+    return make_etag(
+        request, 'product_list', caching.get_version(caching.CATALOG),
+        category_slug, _filter_query(filters), request.GET.get('cursor', ''),
+    )
+
+def _product_list_last_modified(request, category_slug=None):
+    category, products, filters = _listing(request, category_slug)
+    name = f'{category_slug or "all"}:{_filter_query(filters)}'
+    return latest(request, caching.get_listing_modified(name, products), caching.last_changed(caching.CATALOG))
+
+@condition(etag_func=_product_list_etag, last_modified_func=_product_list_last_modified)
+def product_list(request, category_slug=None):
+    category, products, filters = _listing(request, category_slug)
+    price_band = filters['price']
+    in_stock = bool(filters['in_stock'])
+    
+    def build_facets():
+        facets = get_facets(category.id if category else None, price_band, in_stock)
+        for band in facets['price_bands']:
+            band['query'] = _filter_query(filters, price=None if band['selected'] else band['key'])
+        facets['categories'] = [
+            {'category': c, 'count': facets['categories'].get(c.id, 0), 'selected': c == category}
+            for c in caching.get_categories()
+        ]
+        return facets
+    
+    cursor = request.GET.get('cursor', '')
+    paginator = KeysetPaginator(products, PRODUCTS_PER_PAGE, ordering=('-created_at', '-id'))
+    page_obj = SimpleLazyObject(lambda: paginator.get_page(cursor))
+    
     return render(request, 'catalog/product_list.html', {
         'category': category,
-        'products': products
+        'products': page_obj,
+        'page_obj': page_obj,
+        'facets': SimpleLazyObject(build_facets),
+        'price_band': price_band,
+        'in_stock': in_stock,
+        'cursor': cursor,
+        'filter_query': _filter_query(filters),
+        'in_stock_query': _filter_query(filters, in_stock=None if in_stock else '1'),
+        'cache_version': caching.get_version(caching.CATALOG),
+        'cache_timeout': settings.CATALOG_CACHE_TIMEOUT,
+    })
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    
+    products = []
+    if query:
+        # Fetch one extra hit to learn whether a next page exists without counting.
+        products = search_products(query, PRODUCTS_PER_PAGE + 1, (page - 1) * PRODUCTS_PER_PAGE)
+    
+    return render(request, 'catalog/search.html', {
+        'query': query,
+        'products': products[:PRODUCTS_PER_PAGE],
+        'page': page,
+        'has_next': len(products) > PRODUCTS_PER_PAGE,
+        'next_page': page + 1,
+        'previous_page': page - 1,
     })
 
+def _product_detail_etag(request, slug):
+    return make_etag(
+        request, 'product_detail', caching.get_version(*caching.product_detail_scopes(slug)),
+    )
+
+def _product_detail_last_modified(request, slug):
+    product = caching.get_product(slug)
+    if product is None:
+        return None
+    return latest(request, product.updated_at, caching.last_changed(*caching.product_detail_scopes(slug)))
+
+@condition(etag_func=_product_detail_etag, last_modified_func=_product_detail_last_modified)
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, available=True)
-    return render(request, 'catalog/product_detail.html', {'product': product})
+    product = caching.get_product(slug)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    return render(request, 'catalog/product_detail.html', {
+        'product': product,
+        'cache_version': caching.get_version(*caching.product_detail_scopes(slug)),
+        'cache_timeout': settings.CATALOG_CACHE_TIMEOUT,
+    })
@@ -21,9 +21,11 @@ INSTALLED_APPS = [
     "cart",
     "wishlist",
     "orders",
+    "payments",
 ]
 
 MIDDLEWARE = [
+    "admin.instrumentation.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -37,7 +39,7 @@ ROOT_URLCONF = "ecsite.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "admin.instrumentation.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -65,6 +67,15 @@ DATABASES = {
     }
 }
 
+# Cache shared by all workers; the catalog cache is invalidated through versions stored here,
+# so multi-process deployments need a shared backend (file, Redis or Memcached), not locmem.
+CACHES = {
+    "default": {
+        "BACKEND": config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        "LOCATION": config('CACHE_LOCATION', default=str(BASE_DIR / "cache")),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -91,9 +102,34 @@ LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "accounts:profile"
 LOGOUT_REDIRECT_URL = "catalog:home"
 
+# Worker processes that generate image thumbnails and WebP variants after uploads
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+
 # Stripe Settings
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='pk_test_your-publishable-key-here')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_your-secret-key-here')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_your-webhook-secret-here')
 
+# Payment gateway: payments.gateways.StripeGateway, or payments.gateways.FakeGateway for offline load tests
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='payments.gateways.StripeGateway')
+PAYMENT_CONNECT_TIMEOUT = config('PAYMENT_CONNECT_TIMEOUT', default=3.05, cast=float)
+PAYMENT_READ_TIMEOUT = config('PAYMENT_READ_TIMEOUT', default=10.0, cast=float)
+PAYMENT_MAX_RETRIES = config('PAYMENT_MAX_RETRIES', default=2, cast=int)
+PAYMENT_POOL_SIZE = config('PAYMENT_POOL_SIZE', default=10, cast=int)
+# Simulated round trip of the fake gateway, in seconds
+FAKE_PAYMENT_LATENCY = config('FAKE_PAYMENT_LATENCY', default=0.0, cast=float)
+FAKE_PAYMENT_JITTER = config('FAKE_PAYMENT_JITTER', default=0.0, cast=float)
+
+# Catalog search backend; empty picks SQLite FTS5 on SQLite and a plain database scan elsewhere
+CATALOG_SEARCH_BACKEND = config('CATALOG_SEARCH_BACKEND', default='')
+
+# Seconds a rendered catalog fragment may live; edits invalidate it immediately regardless
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds checkout holds stock for an unpaid order before release_expired_reservations returns it
+STOCK_RESERVATION_TTL = config('STOCK_RESERVATION_TTL', default=900, cast=int)
+
+# Who receives the Server-Timing header with per-request DB/template/view timings: all, staff or off
+SERVER_TIMING = config('SERVER_TIMING', default='staff')
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
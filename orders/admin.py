@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusHistory, StockReservation
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -8,8 +8,8 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'total_price', 'status', 'created_at']
-    list_filter = ['status', 'created_at']
+    list_display = ['id', 'user', 'total_price', 'status', 'paid_after_cancel', 'created_at']
+    list_filter = ['status', 'paid_after_cancel', 'created_at']
     search_fields = ['user__username', 'email']
     readonly_fields = ['created_at', 'updated_at']
     inlines = [OrderItemInline]
@@ -19,3 +19,18 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'price', 'quantity', 'get_cost']
     list_filter = ['order__created_at']
     search_fields = ['product__name', 'order__user__username']
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'quantity', 'created_at', 'expires_at']
+    list_filter = ['expires_at']
+    raw_id_fields = ['order', 'product']
+
+@admin.register(OrderStatusHistory)
+class OrderStatusHistoryAdmin(admin.ModelAdmin):
+    list_display = ['order', 'from_status', 'to_status', 'changed_by', 'changed_at']
+    list_filter = ['to_status', 'changed_at']
+    raw_id_fields = ['order', 'changed_by']
+
+    def has_change_permission(self, request, obj=None):
+        return False
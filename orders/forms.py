@@ -2,6 +2,8 @@ from django import forms
 from .models import Order
 
 class OrderForm(forms.ModelForm):
+    idempotency_key = forms.CharField(max_length=64, required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Order
         fields = [
@@ -0,0 +1,162 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from catalog import caching, facets
+from catalog.models import Product
+from payments.gateways import PaymentError, get_gateway
+from .models import Order, OrderItem, OrderStatusHistory, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f'Not enough stock for product {product_id}')
+
+
+def reserve(order, lines, ttl=None):
+    """
+    Take ``lines`` (pairs of product id and quantity) out of stock for
+    ``order`` and record reservations that expire after ``ttl`` seconds.
+
+    Each product is decremented with a single conditional UPDATE, so there
+    is no read-modify-write window and no explicit row lock: the statement
+    matches only while enough stock is left. Either every line is reserved
+    or InsufficientStock is raised and nothing is.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        # A fixed order keeps two orders for the same products from deadlocking.
+        for product_id in sorted(quantities):
+            updated = Product.objects.filter(pk=product_id, stock__gte=quantities[product_id]).update(
+                stock=F('stock') - quantities[product_id]
+            )
+            if not updated:
+                raise InsufficientStock(product_id)
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in quantities.items()
+        ])
+        _stock_changed({product_id: -quantity for product_id, quantity in quantities.items()})
+
+
+def commit_orders(order_ids):
+    """
+    Make the reservations of orders that have been paid for permanent.
+    """
+    return StockReservation.objects.filter(order_id__in=order_ids).delete()[0]
+
+
+def release(order, status='cancelled'):
+    """
+    Return a pending order's reserved stock and move it to ``status``.
+    Returns False if the order was no longer pending, e.g. because payment
+    completed or another worker released it first.
+    """
+    with transaction.atomic():
+        # The conditional status change decides which caller gets to release.
+        if not Order.objects.filter(pk=order.pk, status='pending').update(status=status, updated_at=timezone.now()):
+            return False
+        restock([order.pk])
+        OrderStatusHistory.record({order.pk: 'pending'}, status)
+        cancel_payments([order.pk])
+    return True
+
+
+def restock(order_ids):
+    """
+    Put back the stock reserved for ``order_ids`` and drop the reservations,
+    with one UPDATE per product however many orders hold it. The caller has
+    already taken the orders out of pending.
+    """
+    reserved = defaultdict(int)
+    reservations = StockReservation.objects.filter(order_id__in=order_ids)
+    for product_id, quantity in reservations.values_list('product_id', 'quantity'):
+        reserved[product_id] += quantity
+    _add_stock(reserved)
+    reservations.delete()
+
+
+def return_stock(order_ids):
+    """
+    Put back the stock of cancelled orders that had been paid for, whose
+    reservations were already committed, from their items.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in OrderItem.objects.filter(order_id__in=order_ids).values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    _add_stock(quantities)
+
+
+def _add_stock(quantities):
+    # A fixed order keeps concurrent restocks of the same products from deadlocking.
+    for product_id in sorted(quantities):
+        Product.objects.filter(pk=product_id).update(stock=F('stock') + quantities[product_id])
+    if quantities:
+        _stock_changed(quantities)
+
+
+def cancel_payments(order_ids):
+    """
+    Cancel the payment intents of orders that were cancelled before being
+    paid, once the cancellation commits, so the shopper can't pay for an
+    order that no longer holds stock. An intent that was paid in the
+    meantime can't be cancelled; its webhook flags the order instead.
+    """
+    intent_ids = list(
+        Order.objects.filter(pk__in=order_ids).exclude(payment_intent_id='').values_list('payment_intent_id', flat=True)
+    )
+    if intent_ids:
+        transaction.on_commit(lambda: _cancel_intents(intent_ids))
+
+
+def _cancel_intents(intent_ids):
+    gateway = get_gateway()
+    for intent_id in intent_ids:
+        try:
+            gateway.cancel_payment_intent(intent_id)
+        except PaymentError as e:
+            logger.warning('Cancelling payment intent %s failed: %s', intent_id, e)
+
+
+def release_expired(limit=500):
+    """
+    Release every pending order with a reservation past its expiry. Returns
+    how many orders were released.
+    """
+    order_ids = (
+        StockReservation.objects.filter(expires_at__lte=timezone.now(), order__status='pending')
+        .values_list('order_id', flat=True).distinct()[:limit]
+    )
+    return sum(release(Order(pk=order_id)) for order_id in list(order_ids))
+
+
+def _stock_changed(deltas):
+    """
+    Keep facet counts and cached pages in step with stock moved by UPDATE,
+    which skips the model signals that normally do it. Listings print each
+    product's exact stock, so any change makes them stale.
+    """
+    rows = Product.objects.filter(pk__in=deltas).values_list('id', 'slug', 'category_id', 'price', 'available', 'stock')
+    scopes = {caching.CATALOG}
+    for product_id, slug, category_id, price, available, stock in rows:
+        before = stock - deltas[product_id]
+        scopes.add(caching.product_scope(slug))
+        if (before > 0) != (stock > 0):
+            product = Product(category_id=category_id, price=price, available=available)
+            product.stock = before
+            old_key = facets.facet_key(product)
+            product.stock = stock
+            facets.move(old_key, facets.facet_key(product))
+    transaction.on_commit(lambda: caching.bump(*scopes))
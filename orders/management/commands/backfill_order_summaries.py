@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from orders import summaries
+from orders.models import Order, OrderItem
+
+class Command(BaseCommand):
+    help = 'Recompute the unit count and item summary stored on orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Orders read and written per pass')
+        parser.add_argument('--all', action='store_true', help='Recompute every order, not just those without a summary')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all() if options['all'] else Order.objects.filter(unit_count=0)
+        total = 0
+        with transaction.atomic():
+            for total in summaries.backfill(Order, OrderItem, connection, orders, options['chunk_size']):
+                self.stdout.write(f'{total} orders summarized')
+        self.stdout.write(self.style.SUCCESS(f'Summarized {total} orders'))
@@ -0,0 +1,108 @@
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from catalog.models import Category, Product
+from orders import inventory
+from orders.models import Order
+
+HOT_SKU_SLUG = 'benchmark-hot-sku'
+
+class Command(BaseCommand):
+    help = 'Hammer one product with concurrent checkouts and check stock is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent checkout workers')
+        parser.add_argument('--attempts', type=int, default=500, help='Checkouts attempted across all workers')
+        parser.add_argument('--stock', type=int, default=200, help='Starting stock of the contended product')
+        parser.add_argument('--quantity', type=int, default=1, help='Units each checkout reserves')
+
+    def handle(self, *args, **options):
+        if Product.objects.filter(slug=HOT_SKU_SLUG).exists():
+            raise CommandError(f'A product with slug {HOT_SKU_SLUG!r} already exists; delete it first.')
+
+        category = Category.objects.first() or Category.objects.create(name='Benchmark')
+        product = Product.objects.create(
+            category=category, name='Benchmark Hot SKU', slug=HOT_SKU_SLUG,
+            description='Contended product for benchmark_inventory.', price=Decimal('10.00'), stock=options['stock'],
+        )
+        user, created = User.objects.get_or_create(username='benchmark_inventory')
+
+        self.lock = threading.Lock()
+        self.remaining = options['attempts']
+        self.latencies, self.reserved, self.sold_out, self.errors = [], 0, 0, 0
+
+        workers = [
+            threading.Thread(target=self.worker, args=(user, product.id, options['quantity']))
+            for _ in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        expected = options['stock'] - self.reserved * options['quantity']
+        try:
+            self.report(options, elapsed, product.stock, expected)
+        finally:
+            Order.objects.filter(user=user).delete()
+            product.delete()
+
+    def worker(self, user, product_id, quantity):
+        try:
+            while True:
+                with self.lock:
+                    if not self.remaining:
+                        return
+                    self.remaining -= 1
+
+                started = time.perf_counter()
+                outcome = 'reserved'
+                try:
+                    with transaction.atomic():
+                        order = Order.objects.create(
+                            user=user, first_name='Bench', last_name='Mark', email='bench@example.com',
+                            phone='0', address='-', city='-', postal_code='-', country='-',
+                            total_price=Decimal('10.00') * quantity,
+                        )
+                        inventory.reserve(order, [(product_id, quantity)])
+                except inventory.InsufficientStock:
+                    outcome = 'sold_out'
+                except DatabaseError:
+                    outcome = 'error'
+                elapsed = time.perf_counter() - started
+
+                with self.lock:
+                    self.latencies.append(elapsed)
+                    if outcome == 'reserved':
+                        self.reserved += 1
+                    elif outcome == 'sold_out':
+                        self.sold_out += 1
+                    else:
+                        self.errors += 1
+        finally:
+            connection.close()
+
+    def report(self, options, elapsed, final_stock, expected):
+        latencies = sorted(self.latencies)
+        p95 = latencies[max(0, round(0.95 * len(latencies)) - 1)]
+        self.stdout.write(
+            f'{options["threads"]} workers, {len(latencies)} checkouts in {elapsed:.2f}s '
+            f'({len(latencies) / elapsed:.0f} checkouts/sec)'
+        )
+        self.stdout.write(
+            f'latency p50 {statistics.median(latencies) * 1000:.1f}ms  p95 {p95 * 1000:.1f}ms  '
+            f'max {latencies[-1] * 1000:.1f}ms'
+        )
+        self.stdout.write(f'reserved {self.reserved}, sold out {self.sold_out}, database errors {self.errors}')
+
+        if final_stock != expected or final_stock < 0:
+            raise CommandError(f'Stock is {final_stock} but {expected} was expected: inventory was oversold')
+        self.stdout.write(self.style.SUCCESS(f'No overselling: {final_stock} units left as expected'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from orders import inventory
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose stock reservation has expired and return the stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders released per pass')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            released = inventory.release_expired(limit=options['batch_size'])
+            total += released
+            if released < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Released stock for {total} expired orders'))
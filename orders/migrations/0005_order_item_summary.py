@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def summarize_orders(apps, schema_editor):
+    from orders import summaries
+
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    for total in summaries.backfill(Order, OrderItem, schema_editor.connection, Order.objects.all()):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_status_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_summary',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_history_idx'),
+        ),
+        migrations.RunPython(summarize_orders, migrations.RunPython.noop),
+    ]
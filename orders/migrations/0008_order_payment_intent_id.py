@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_status_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_intent_id',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
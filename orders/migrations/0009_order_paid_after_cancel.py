@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_payment_intent_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='paid_after_cancel',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from catalog.models import Product
+from .signals import status_changed
+from .summaries import summarize
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -11,6 +13,16 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # The statuses an order may move to from each status. Delivered and
+    # cancelled orders are final.
+    TRANSITIONS = {
+        'pending': ['confirmed', 'cancelled'],
+        'confirmed': ['processing', 'cancelled'],
+        'processing': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+        'delivered': [],
+        'cancelled': [],
+    }
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=100)
@@ -26,10 +38,47 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     stripe_payment_id = models.CharField(max_length=100, blank=True)
+    # The intent opened at checkout, kept so it can be cancelled if the
+    # order is cancelled before it is paid.
+    payment_intent_id = models.CharField(max_length=100, blank=True, editable=False)
+    # Set when a payment arrives for an order that was already cancelled:
+    # it has to be refunded or its stock reserved again by hand.
+    paid_after_cancel = models.BooleanField(default=False)
+    # Sent with the checkout form so a resubmitted form finds this order again.
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # Written once at checkout so order listings needn't read the items.
+    # unit_count is the total quantity, not the number of lines.
+    unit_count = models.PositiveIntegerField(default=0)
+    item_summary = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = ['user', 'idempotency_key']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_history_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_recent_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
+    def summarize_items(self, lines):
+        """
+        Set unit_count and item_summary from ``(product name, quantity)``
+        pairs.
+        """
+        self.unit_count, self.item_summary = summarize(lines)
+
+    def can_move_to(self, status):
+        return status in self.TRANSITIONS.get(self.status, [])
+
+    @classmethod
+    def statuses_before(cls, status):
+        """
+        The statuses an order can be in to move to ``status``.
+        """
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -41,3 +90,51 @@ class OrderItem(models.Model):
 
     def get_cost(self):
         return self.price * self.quantity
+
+class StockReservation(models.Model):
+    """
+    Stock held back for an unpaid order. The product's stock is already
+    decremented; deleting the reservation on payment makes that permanent,
+    while releasing it after expires_at puts the stock back.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ['order', 'product']
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+
+class OrderStatusHistory(models.Model):
+    """
+    One status change of an order. Rows are only ever added.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        verbose_name_plural = 'order status history'
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} -> {self.to_status}"
+
+    @classmethod
+    def record(cls, moved, to_status, changed_by=None):
+        """
+        Write one row per order in ``moved``, a mapping of order id to the
+        status it had before, in a single INSERT, and send status_changed.
+        """
+        rows = cls.objects.bulk_create([
+            cls(order_id=order_id, from_status=from_status, to_status=to_status, changed_by=changed_by)
+            for order_id, from_status in moved.items()
+        ])
+        status_changed.send(sender=Order, moved=moved, status=to_status)
+        return rows
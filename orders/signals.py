@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent whenever orders change status. Status changes are made with
+# conditional UPDATEs that bypass post_save, so listeners that keep counts
+# per status hook in here. Arguments: ``moved``, a mapping of order id to
+# the status it had before, and ``status``, the status it has now.
+status_changed = Signal()
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.utils import timezone
+from . import inventory
+from .models import Order, OrderStatusHistory
+
+
+def transition(order_ids, status, changed_by=None):
+    """
+    Move every order in ``order_ids`` that is allowed to go to ``status``
+    there, and return a mapping of the moved order ids to the status each
+    had before. Orders the state machine doesn't allow to move are left
+    alone and missing from the result.
+
+    However many orders are given, this is one locking read, one
+    conditional UPDATE and one INSERT into the status history. Confirming
+    an order commits its stock reservation. Cancelling a pending order
+    returns its reserved stock and cancels its payment intent; cancelling
+    a paid one returns the stock of its items.
+    """
+    sources = Order.statuses_before(status)
+    if not sources or not order_ids:
+        return {}
+
+    with transaction.atomic():
+        # Locking the rows keeps the recorded from_status true on databases
+        # that allow concurrent writers.
+        moved = dict(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, status__in=sources)
+            .values_list('pk', 'status')
+        )
+        if not moved:
+            return {}
+        Order.objects.filter(pk__in=moved, status__in=sources).update(status=status, updated_at=timezone.now())
+        if status == 'confirmed':
+            # Paid: the stock is theirs, so the reservations must not expire.
+            inventory.commit_orders(list(moved))
+        elif status == 'cancelled':
+            unpaid = [order_id for order_id, before in moved.items() if before == 'pending']
+            inventory.restock(unpaid)
+            inventory.cancel_payments(unpaid)
+            inventory.return_stock([order_id for order_id, before in moved.items() if before != 'pending'])
+        OrderStatusHistory.record(moved, status, changed_by)
+    return moved
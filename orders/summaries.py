@@ -0,0 +1,52 @@
+from itertools import groupby
+
+from django.utils.text import Truncator
+
+# How many products an order's item summary names.
+SUMMARY_PRODUCTS = 3
+
+
+def summarize(lines):
+    """
+    Return the unit count and short summary for ``(product name,
+    quantity)`` pairs, naming the first few products.
+    """
+    lines = list(lines)
+    parts = [f'{quantity}x {name}' for name, quantity in lines[:SUMMARY_PRODUCTS]]
+    if len(lines) > SUMMARY_PRODUCTS:
+        parts.append(f'and {len(lines) - SUMMARY_PRODUCTS} more')
+    return sum(quantity for name, quantity in lines), Truncator(', '.join(parts)).chars(255)
+
+
+def backfill(order_model, item_model, connection, orders, chunk_size=2000):
+    """
+    Store the unit count and summary of ``orders`` in primary key chunks,
+    yielding the running total after each. Takes the models so migrations
+    can pass their historical ones.
+    """
+    qn = connection.ops.quote_name
+    # bulk_update builds a CASE per row and field; a prepared statement per row is far cheaper.
+    sql = (
+        f'UPDATE {qn(order_model._meta.db_table)} SET {qn("unit_count")} = %s, {qn("item_summary")} = %s '
+        f'WHERE {qn("id")} = %s'
+    )
+    last_id, total = 0, 0
+    while True:
+        # Walking the primary key keeps every pass an indexed range read.
+        chunk = list(orders.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        items = (
+            item_model.objects.filter(order_id__in=chunk)
+            .order_by('order_id', 'id').values_list('order_id', 'product__name', 'quantity')
+        )
+        lines = {
+            order_id: [(name, quantity) for _, name, quantity in rows]
+            for order_id, rows in groupby(items, key=lambda row: row[0])
+        }
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(*summarize(lines.get(order_id, [])), order_id) for order_id in chunk])
+        total += len(chunk)
+        yield total
@@ -2,71 +2,113 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
-import stripe
+from django.db import IntegrityError, transaction
+import uuid
+from . import inventory, status
 from .models import Order, OrderItem
 from .forms import OrderForm
-from cart.cart import Cart
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from cart.cart import get_cart
+from catalog.pagination import KeysetPaginator
+from payments.gateways import PaymentError, get_gateway
 
 @login_required
 def checkout(request):
-    cart = Cart(request)
-    if not cart:
+    cart = get_cart(request)
+    # The session's cached count goes stale when another device changes the cart.
+    if not cart.snapshot().items:
         messages.warning(request, 'Your cart is empty!')
         return redirect('cart:detail')
 
     if request.method == 'POST':
         form = OrderForm(request.POST)
         if form.is_valid():
-            order = form.save(commit=False)
-            order.user = request.user
-            order.total_price = cart.get_total_price()
-            order.save()
+            key = form.cleaned_data['idempotency_key'] or None
+            order = Order.objects.filter(user=request.user, idempotency_key=key).first() if key else None
+            if order is None:
+                try:
+                    order = _place_order(request.user, form, cart, key)
+                except inventory.InsufficientStock as e:
+                    names = {item.product.id: item.product.name for item in cart}
+                    messages.error(request, f'Sorry, there is not enough stock left for {names.get(e.product_id, "an item")}.')
+                    return redirect('cart:detail')
+            elif order.status != 'pending':
+                # A retry of a checkout that has already been paid for.
+                return redirect('orders:order_detail', order_id=order.id)
 
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
-
-            # Create Stripe payment intent
+            # Create the payment intent
             try:
-                intent = stripe.PaymentIntent.create(
+                intent = get_gateway().create_payment_intent(
                     amount=int(order.total_price * 100),  # Convert to cents
                     currency='usd',
-                    metadata={'order_id': order.id}
+                    metadata={'order_id': order.id},
+                    # A retried checkout gets the same intent back instead of a second charge.
+                    idempotency_key=f'order-{order.id}',
                 )
+                if order.payment_intent_id != intent.id:
+                    order.payment_intent_id = intent.id
+                    Order.objects.filter(pk=order.pk).update(payment_intent_id=intent.id)
                 return render(request, 'orders/payment.html', {
                     'order': order,
                     'client_secret': intent.client_secret,
                     'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY
                 })
-            except stripe.error.StripeError as e:
+            except PaymentError as e:
+                inventory.release(order)
                 messages.error(request, f'Payment error: {str(e)}')
                 return redirect('orders:checkout')
     else:
-        form = OrderForm()
+        form = OrderForm(initial={'idempotency_key': uuid.uuid4().hex})
 
     return render(request, 'orders/checkout.html', {'form': form})
 
+def _place_order(user, form, cart, key):
+    """
+    Create the order, its items and its stock reservation as one unit. If a
+    concurrent submit with the same key won the race, return its order.
+    """
+    try:
+        # The order, its items and the stock it holds stand or fall together.
+        with transaction.atomic():
+            order = form.save(commit=False)
+            order.user = user
+            order.idempotency_key = key
+            order.total_price = cart.get_total_price()
+            order.summarize_items((item.product.name, item.quantity) for item in cart)
+            order.save()
+
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=item.product, price=item.price, quantity=item.quantity)
+                for item in cart
+            ])
+
+            # Reserving last keeps the hot product rows locked for the shortest time.
+            inventory.reserve(order, [(item.product.id, item.quantity) for item in cart])
+    except IntegrityError:
+        order = Order.objects.filter(user=user, idempotency_key=key).first() if key else None
+        if order is None:
+            raise
+    return order
+
+ORDERS_PER_PAGE = 10
+
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'orders/order_list.html', {'orders': orders})
+    # Each card shows the summary stored on the order, so no items are read.
+    orders = Order.objects.filter(user=request.user)
+    # Keyset pages stay as fast for a customer's thousandth order as their first.
+    paginator = KeysetPaginator(orders, ORDERS_PER_PAGE, ordering=('-created_at', '-id'))
+    page_obj = paginator.get_page(request.GET.get('cursor', ''))
+    return render(request, 'orders/order_list.html', {'orders': page_obj, 'page_obj': page_obj})
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.prefetch_related('items__product__category'), id=order_id, user=request.user)
     return render(request, 'orders/order_detail.html', {'order': order})
 
 def payment_success(request):
     order_id = request.GET.get('order_id')
     if order_id:
         order = get_object_or_404(Order, id=order_id)
-        order.status = 'confirmed'
-        order.save()
+        status.transition([order.id], 'confirmed')
         messages.success(request, 'Payment successful! Your order has been confirmed.')
     return redirect('orders:order_list')
@@ -1,4 +1,9 @@
 from django.contrib import admin
+from .models import WebhookEvent
 
-# Payments app handles webhooks and doesn't have persistent models
-# All payment data is stored in the Order model
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'received_at', 'processed_at', 'result']
+    list_filter = ['type', 'processed_at']
+    search_fields = ['event_id']
+    readonly_fields = ['event_id', 'type', 'payload', 'received_at', 'processed_at', 'result']
@@ -0,0 +1,163 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from django.conf import settings
+from django.test.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class PaymentError(Exception):
+    pass
+
+
+class InvalidWebhook(PaymentError):
+    pass
+
+
+class PaymentIntent(NamedTuple):
+    id: str
+    client_secret: str
+
+
+class BaseGateway:
+    def create_payment_intent(self, amount, currency, metadata, idempotency_key):
+        """
+        Start a payment of ``amount`` in the currency's smallest unit. Calls
+        with the same ``idempotency_key`` return the same intent.
+        """
+        raise NotImplementedError
+
+    def cancel_payment_intent(self, intent_id):
+        """
+        Cancel an intent that has not been paid, so it can no longer be.
+        Raises PaymentError if the gateway refuses, e.g. because it already
+        succeeded.
+        """
+        raise NotImplementedError
+
+    def construct_event(self, payload, signature):
+        """
+        Verify a webhook delivery and return the event as a mapping with
+        'id', 'type' and 'data'. Raises InvalidWebhook.
+        """
+        raise NotImplementedError
+
+
+class StripeGateway(BaseGateway):
+    """
+    Stripe over a pooled keep-alive HTTP session with explicit connect/read
+    timeouts. Transient failures are retried with full-jitter exponential
+    backoff; the idempotency key makes a retried create safe.
+    """
+
+    def __init__(self):
+        import requests
+        import stripe
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=settings.PAYMENT_POOL_SIZE))
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.default_http_client = stripe.RequestsClient(
+            timeout=(settings.PAYMENT_CONNECT_TIMEOUT, settings.PAYMENT_READ_TIMEOUT), session=session
+        )
+        # Retries happen here, where the backoff is under our control.
+        stripe.max_network_retries = 0
+        self.stripe = stripe
+        self.max_retries = settings.PAYMENT_MAX_RETRIES
+
+    def _retrying(self, call):
+        stripe = self.stripe
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call()
+            except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError) as e:
+                status = getattr(e, 'http_status', None)
+                transient = not isinstance(e, stripe.error.APIError) or status is None or status >= 500
+                if not transient or attempt == self.max_retries:
+                    raise PaymentError(str(e)) from e
+                time.sleep(random.uniform(0, min(2.0, 0.25 * 2 ** attempt)))
+            except stripe.error.StripeError as e:
+                raise PaymentError(str(e)) from e
+
+    def create_payment_intent(self, amount, currency, metadata, idempotency_key):
+        intent = self._retrying(lambda: self.stripe.PaymentIntent.create(
+            amount=amount, currency=currency, metadata=metadata, idempotency_key=idempotency_key,
+        ))
+        return PaymentIntent(intent.id, intent.client_secret)
+
+    def cancel_payment_intent(self, intent_id):
+        self._retrying(lambda: self.stripe.PaymentIntent.cancel(intent_id))
+
+    def construct_event(self, payload, signature):
+        try:
+            return self.stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+        except (ValueError, self.stripe.error.SignatureVerificationError) as e:
+            raise InvalidWebhook(str(e)) from e
+
+
+class FakeGateway(BaseGateway):
+    """
+    In-process stand-in for load tests and offline development. Each create
+    sleeps for FAKE_PAYMENT_LATENCY seconds, give or take FAKE_PAYMENT_JITTER,
+    to mimic the round trip. Webhook payloads are accepted unsigned.
+    """
+
+    def __init__(self):
+        self.latency = settings.FAKE_PAYMENT_LATENCY
+        self.jitter = settings.FAKE_PAYMENT_JITTER
+        self._intents = {}
+        self.cancelled = set()
+        self._lock = threading.Lock()
+
+    def create_payment_intent(self, amount, currency, metadata, idempotency_key):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        with self._lock:
+            intent = self._intents.get(idempotency_key)
+            if intent is None:
+                intent_id = f'pi_fake_{uuid.uuid4().hex[:24]}'
+                intent = self._intents[idempotency_key] = PaymentIntent(intent_id, f'{intent_id}_secret_fake')
+        return intent
+
+    def cancel_payment_intent(self, intent_id):
+        with self._lock:
+            self.cancelled.add(intent_id)
+
+    def construct_event(self, payload, signature):
+        try:
+            event = json.loads(payload)
+        except ValueError as e:
+            raise InvalidWebhook(str(e)) from e
+        if not isinstance(event, dict):
+            raise InvalidWebhook('Event payload must be an object')
+        return event
+
+
+_gateway = None
+_gateway_pid = None
+
+
+def get_gateway():
+    """
+    Return this process's gateway, built on first use so that connection
+    pools are never shared across forked workers.
+    """
+    global _gateway, _gateway_pid
+    if _gateway is None or _gateway_pid != os.getpid():
+        _gateway = import_string(settings.PAYMENT_GATEWAY)()
+        _gateway_pid = os.getpid()
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    global _gateway
+    if setting.startswith(('PAYMENT_', 'FAKE_PAYMENT_', 'STRIPE_')):
+        _gateway = None
@@ -0,0 +1,111 @@
+from django.db import models, transaction
+from django.db.models import Case, Count, Min, Value, When
+from django.utils import timezone
+from orders import inventory
+from orders import status as order_status
+from orders.models import Order
+from .models import WebhookEvent
+
+PAYMENT_SUCCEEDED = 'payment_intent.succeeded'
+PAYMENT_FAILED = 'payment_intent.payment_failed'
+PAYMENT_CANCELED = 'payment_intent.canceled'
+
+
+def _order_id(event):
+    try:
+        return int(event.payload['data']['object']['metadata']['order_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _payment_ids(succeeded, order_ids):
+    return Case(
+        *(When(pk=order_id, then=Value(succeeded[order_id])) for order_id in order_ids),
+        output_field=models.CharField(),
+    )
+
+
+def process_batch(batch_size=500):
+    """
+    Apply the oldest unprocessed events and mark them processed. Returns a
+    dict counting events per outcome; empty when the inbox is drained.
+
+    Payment confirmations for the whole batch go through one locked
+    status transition that only moves orders still pending, so replays and
+    a second worker picking up the same events change nothing. A payment
+    for an order that was cancelled first, e.g. because its reservation
+    expired, is kept on the order and the order flagged paid_after_cancel.
+
+    A failed payment is only recorded: the shopper can retry with the same
+    intent, so the order keeps its stock until the reservation expires or
+    the intent is cancelled.
+    """
+    events = list(WebhookEvent.objects.filter(processed_at__isnull=True).order_by('received_at', 'id')[:batch_size])
+    if not events:
+        return {}
+
+    results = {}
+    succeeded, canceled = {}, set()
+    for event in events:
+        order_id = _order_id(event)
+        if event.type not in (PAYMENT_SUCCEEDED, PAYMENT_FAILED, PAYMENT_CANCELED):
+            results[event.pk] = 'ignored'
+        elif order_id is None:
+            results[event.pk] = 'no order id'
+        elif event.type == PAYMENT_SUCCEEDED:
+            succeeded[order_id] = event.payload['data']['object'].get('id', '')
+        elif event.type == PAYMENT_FAILED:
+            results[event.pk] = 'recorded: payment failed'
+        else:
+            canceled.add(order_id)
+
+    with transaction.atomic():
+        # Only the orders this worker moved get the payment id, history and stats.
+        confirmed = set(order_status.transition(list(succeeded), 'confirmed'))
+        if confirmed:
+            Order.objects.filter(pk__in=confirmed).update(stripe_payment_id=_payment_ids(succeeded, confirmed))
+
+        # The customer was charged for an order that no longer holds stock.
+        late = Order.objects.select_for_update().filter(
+            pk__in=succeeded.keys() - confirmed, status='cancelled', stripe_payment_id=''
+        )
+        flagged = set(late.values_list('pk', flat=True))
+        if flagged:
+            Order.objects.filter(pk__in=flagged).update(
+                stripe_payment_id=_payment_ids(succeeded, flagged),
+                paid_after_cancel=True,
+                updated_at=timezone.now(),
+            )
+
+    released = {order_id for order_id in canceled if inventory.release(Order(pk=order_id))}
+
+    for event in events:
+        if event.pk in results:
+            continue
+        order_id = _order_id(event)
+        if event.type == PAYMENT_SUCCEEDED:
+            if order_id in confirmed:
+                results[event.pk] = 'confirmed'
+            elif order_id in flagged:
+                results[event.pk] = 'flagged: paid after cancel'
+            else:
+                results[event.pk] = 'skipped: order not pending'
+        else:
+            results[event.pk] = 'released' if order_id in released else 'skipped: order not pending'
+
+    by_result = {}
+    for event_id, result in results.items():
+        by_result.setdefault(result, []).append(event_id)
+    now = timezone.now()
+    for result, event_ids in by_result.items():
+        WebhookEvent.objects.filter(pk__in=event_ids, processed_at__isnull=True).update(processed_at=now, result=result)
+    return {result: len(event_ids) for result, event_ids in by_result.items()}
+
+
+def backlog():
+    """
+    Return how many events are waiting and how long the oldest has waited.
+    """
+    pending = WebhookEvent.objects.filter(processed_at__isnull=True).aggregate(count=Count('id'), oldest=Min('received_at'))
+    lag = timezone.now() - pending['oldest'] if pending['oldest'] else None
+    return pending['count'], lag
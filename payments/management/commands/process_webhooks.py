@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from payments import inbox
+
+class Command(BaseCommand):
+    help = 'Apply stored payment webhook events in batches and report the backlog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events applied per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events instead of exiting when drained')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait between polls when idle')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            started = time.monotonic()
+            outcomes = inbox.process_batch(options['batch_size'])
+            if outcomes:
+                processed = sum(outcomes.values())
+                total += processed
+                elapsed = time.monotonic() - started
+                waiting, lag = inbox.backlog()
+                summary = ', '.join(f'{count} {result}' for result, count in sorted(outcomes.items()))
+                self.stdout.write(
+                    f'{processed} events in {elapsed * 1000:.0f}ms ({summary}); '
+                    f'{waiting} waiting, lag {lag.total_seconds() if lag else 0:.1f}s'
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} webhook events'))
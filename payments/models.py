@@ -0,0 +1,19 @@
+from django.db import models
+
+class WebhookEvent(models.Model):
+    """
+    A payment provider event, stored as received and applied later by the
+    process_webhooks worker. The unique event id makes redeliveries no-ops.
+    """
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    result = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'received_at'], name='webhook_inbox_idx')]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
@@ -1,35 +1,26 @@
+import json
+
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-import stripe
-from orders.models import Order
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from .gateways import InvalidWebhook, get_gateway
+from .models import WebhookEvent
 
 @csrf_exempt
 def stripe_webhook(request):
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except ValueError:
-        return JsonResponse({'error': 'Invalid payload'}, status=400)
-    except stripe.error.SignatureVerificationError:
-        return JsonResponse({'error': 'Invalid signature'}, status=400)
-
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        order_id = payment_intent['metadata']['order_id']
-        
-        try:
-            order = Order.objects.get(id=order_id)
-            order.status = 'confirmed'
-            order.stripe_payment_id = payment_intent.id
-            order.save()
-        except Order.DoesNotExist:
-            pass
+        event = get_gateway().construct_event(payload, sig_header)
+    except InvalidWebhook:
+        return JsonResponse({'error': 'Invalid payload or signature'}, status=400)
+    if not event.get('id'):
+        return JsonResponse({'error': 'Event has no id'}, status=400)
 
+    # Store and acknowledge; process_webhooks applies it. A redelivered event
+    # hits the unique event id and is ignored.
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event['id'], type=event['type'], payload=json.loads(payload))],
+        ignore_conflicts=True,
+    )
     return JsonResponse({'status': 'success'})